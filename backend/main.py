@@ -1,7 +1,12 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse, Response
 from contextlib import asynccontextmanager
+import asyncio
+import json
 import logging
+import orjson
+from hashlib import blake2b
 from typing import List, Optional
 from datetime import datetime
 
@@ -18,23 +23,14 @@ from shared.models import (
     ProblemGenerationRequest, ProblemGenerationResponse,
     HintRequest, HintResponse, CodeReviewRequest, CodeReviewResponse
 )
-from shared.config import setup_logging
+from shared.config import setup_logging, MAX_CODE_REVIEW_LENGTH
 
 # Initialize logging
 logger = setup_logging()
 
-# Global service instances
-gemini_service = None
-data_service = None
-problem_generator_service = None
-hint_service = None
-code_review_service = None
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
-    global gemini_service, data_service, problem_generator_service, hint_service, code_review_service
-    
     # Startup
     logger.info("Starting DSA Mentor Backend Services...")
     
@@ -46,6 +42,16 @@ async def lifespan(app: FastAPI):
         hint_service = HintService(gemini_service)
         code_review_service = CodeReviewService(gemini_service)
         
+        # Establish Gemini connections before traffic arrives
+        await gemini_service.prewarm()
+        
+        # Services live on app.state for the lifetime of the app
+        app.state.gemini_service = gemini_service
+        app.state.data_service = data_service
+        app.state.problem_generator_service = problem_generator_service
+        app.state.hint_service = hint_service
+        app.state.code_review_service = code_review_service
+        
         logger.info("All services initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize services: {str(e)}")
@@ -55,12 +61,14 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down DSA Mentor Backend Services...")
+    await app.state.gemini_service.aclose()
 
 # Create FastAPI app
 app = FastAPI(
     title="DSA Mentor API",
     description="Backend API for DSA Coach AI - Intelligent coding mentor",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -73,31 +81,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Dependency to get services
-def get_gemini_service() -> GeminiService:
-    if gemini_service is None:
-        raise HTTPException(status_code=500, detail="Gemini service not initialized")
-    return gemini_service
+@app.middleware("http")
+async def conditional_user_get(request: Request, call_next):
+    """Tag user data GETs with an ETag and answer 304 when the client's copy is current.
+    
+    The tag covers only the response's data: the APIResponse envelope carries a
+    per-request timestamp that would otherwise give every response a new tag.
+    """
+    response = await call_next(request)
+    if request.method != "GET" or response.status_code != 200 or not request.url.path.startswith("/api/users/"):
+        return response
+    
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    data = orjson.dumps(orjson.loads(body).get("data"))
+    etag = f'"{blake2b(data, digest_size=16).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    headers = dict(response.headers)
+    headers["ETag"] = etag
+    return Response(content=body, status_code=200, headers=headers, media_type=response.media_type)
+
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Turn any unhandled error into an ErrorResponse"""
+    logger.error(f"Error handling {request.method} {request.url.path}: {str(exc)}")
+    error = ErrorResponse(error="Internal server error", details=str(exc))
+    return ORJSONResponse(error.model_dump(), status_code=500)
 
-def get_data_service() -> DataService:
-    if data_service is None:
-        raise HTTPException(status_code=500, detail="Data service not initialized")
-    return data_service
+# Dependencies to get services; lifespan populates app.state before any request is served
+async def get_gemini_service(request: Request) -> GeminiService:
+    return request.app.state.gemini_service
 
-def get_problem_generator_service() -> ProblemGeneratorService:
-    if problem_generator_service is None:
-        raise HTTPException(status_code=500, detail="Problem generator service not initialized")
-    return problem_generator_service
+async def get_data_service(request: Request) -> DataService:
+    return request.app.state.data_service
 
-def get_hint_service() -> HintService:
-    if hint_service is None:
-        raise HTTPException(status_code=500, detail="Hint service not initialized")
-    return hint_service
+async def get_problem_generator_service(request: Request) -> ProblemGeneratorService:
+    return request.app.state.problem_generator_service
 
-def get_code_review_service() -> CodeReviewService:
-    if code_review_service is None:
-        raise HTTPException(status_code=500, detail="Code review service not initialized")
-    return code_review_service
+async def get_hint_service(request: Request) -> HintService:
+    return request.app.state.hint_service
+
+async def get_code_review_service(request: Request) -> CodeReviewService:
+    return request.app.state.code_review_service
 
 # Health check endpoint
 @app.get("/health")
@@ -109,45 +135,37 @@ async def health_check():
 @app.get("/api/status")
 async def api_status(gemini: GeminiService = Depends(get_gemini_service)):
     """Get API and service status"""
-    try:
-        gemini_status = gemini.test_connection()
-        model_info = gemini.get_model_info()
+    gemini_status = await gemini.test_connection()
+    model_info = gemini.get_model_info()
         
-        return APIResponse(
-            success=True,
-            message="API status retrieved successfully",
-            data={
-                "gemini_connected": gemini_status,
-                "model_info": model_info,
-                "services_running": True
-            }
-        )
-    except Exception as e:
-        logger.error(f"Error getting API status: {str(e)}")
-        return ErrorResponse(error="Failed to get API status", details=str(e))
+    return APIResponse(
+        success=True,
+        message="API status retrieved successfully",
+        data={
+            "gemini_connected": gemini_status,
+            "model_info": model_info,
+            "services_running": True
+        }
+    )
 
 # User Profile endpoints
 @app.get("/api/users/{user_id}/profile")
 async def get_user_profile(user_id: str, data: DataService = Depends(get_data_service)):
     """Get user profile"""
-    try:
-        profile = data.get_user_profile(user_id)
-        
-        if profile is None:
-            return APIResponse(
-                success=False,
-                message="User profile not found",
-                data=None
-            )
+    profile = data.get_user_profile(user_id)
         
+    if profile is None:
         return APIResponse(
-            success=True,
-            message="User profile retrieved successfully",
-            data=profile.model_dump()
+            success=False,
+            message="User profile not found",
+            data=None
         )
-    except Exception as e:
-        logger.error(f"Error getting user profile: {str(e)}")
-        return ErrorResponse(error="Failed to get user profile", details=str(e))
+        
+    return APIResponse(
+        success=True,
+        message="User profile retrieved successfully",
+        data=profile.model_dump()
+    )
 
 @app.post("/api/users/{user_id}/profile")
 async def update_user_profile(
@@ -156,71 +174,60 @@ async def update_user_profile(
     data: DataService = Depends(get_data_service)
 ):
     """Update user profile"""
-    try:
-        success = data.update_user_profile(user_id, profile)
+    success = data.update_user_profile(user_id, profile)
         
-        if success:
-            return APIResponse(
-                success=True,
-                message="User profile updated successfully",
-                data=profile.model_dump()
-            )
-        else:
-            return APIResponse(
-                success=False,
-                message="Failed to update user profile",
-                data=None
-            )
-    except Exception as e:
-        logger.error(f"Error updating user profile: {str(e)}")
-        return ErrorResponse(error="Failed to update user profile", details=str(e))
+    if success:
+        return APIResponse(
+            success=True,
+            message="User profile updated successfully",
+            data=profile.model_dump()
+        )
+    else:
+        return APIResponse(
+            success=False,
+            message="Failed to update user profile",
+            data=None
+        )
 
 # Problem Generation endpoints
 @app.post("/api/problems/generate")
 async def generate_problems(
     request: ProblemGenerationRequest,
     user_id: str,
+    background_tasks: BackgroundTasks,
     problem_gen: ProblemGeneratorService = Depends(get_problem_generator_service),
     data: DataService = Depends(get_data_service)
 ):
     """Generate problem variations"""
-    try:
-        problems = problem_gen.generate_problems(request)
+    problems = await problem_gen.generate_problems(request)
         
-        # Save to history
-        data.save_generated_problems(user_id, request.original_problem, problems)
+    # Save to history once the response has been sent
+    background_tasks.add_task(data.save_generated_problems, user_id, request.original_problem, problems)
         
-        response = ProblemGenerationResponse(
-            problems=problems,
-            generation_timestamp=datetime.now(),
-            user_id=user_id
-        )
+    response = ProblemGenerationResponse(
+        problems=problems,
+        generation_timestamp=datetime.now(),
+        user_id=user_id
+    )
         
-        return APIResponse(
-            success=True,
-            message=f"Generated {len(problems)} problem variations",
-            data=response.model_dump()
-        )
-    except Exception as e:
-        logger.error(f"Error generating problems: {str(e)}")
-        return ErrorResponse(error="Failed to generate problems", details=str(e))
+    return APIResponse(
+        success=True,
+        message=f"Generated {len(problems)} problem variations",
+        data=response.model_dump()
+    )
 
 @app.get("/api/problems/random")
 async def get_random_problem(
     problem_gen: ProblemGeneratorService = Depends(get_problem_generator_service)
 ):
     """Get a random practice problem"""
-    try:
-        problem = problem_gen.get_random_problem()
+    problem = problem_gen.get_random_problem()
         
-        return APIResponse(
-            success=True,
-            message="Random problem generated",
-            data=problem.model_dump()
-        )
-    except Exception as e:
-        logger.error(f"Error getting random problem: {str(e)}")
-        return ErrorResponse(error="Failed to get random problem", details=str(e))
+    return APIResponse(
+        success=True,
+        message="Random problem generated",
+        data=problem.model_dump()
+    )
 
 @app.get("/api/users/{user_id}/problems/recent")
 async def get_recent_problems(
@@ -229,132 +236,167 @@ async def get_recent_problems(
     data: DataService = Depends(get_data_service)
 ):
     """Get user's recent problems"""
-    try:
-        problems = data.get_recent_problems(user_id, limit)
+    problems = data.get_recent_problems(user_id, limit)
         
-        return APIResponse(
-            success=True,
-            message=f"Retrieved {len(problems)} recent problems",
-            data=problems
-        )
-    except Exception as e:
-        logger.error(f"Error getting recent problems: {str(e)}")
-        return ErrorResponse(error="Failed to get recent problems", details=str(e))
+    return APIResponse(
+        success=True,
+        message=f"Retrieved {len(problems)} recent problems",
+        data=problems
+    )
 
 # Hint System endpoints
 @app.post("/api/hints/next")
 async def get_next_hint(
     request: HintRequest,
     user_id: str,
+    background_tasks: BackgroundTasks,
     hint_svc: HintService = Depends(get_hint_service),
     data: DataService = Depends(get_data_service)
 ):
     """Get next level hint"""
-    try:
-        # Get user context
-        user_profile = data.get_user_profile(user_id)
-        user_context = {"user_profile": user_profile.model_dump() if user_profile else None}
-        
-        # This is a simplified implementation - in practice you'd need to store/retrieve the current problem
-        # For now, we'll create a dummy problem
-        problem = Problem(
-            title="Current Problem",
-            statement="Problem statement would be stored in session",
-            difficulty="Medium",
-            core_concept="Algorithm Practice",
-            context="Generated problem",
-            estimated_time="20 min",
-            complexity="O(n)"
-        )
+    problem = request.problem
+    
+    # Get user context
+    user_profile = data.get_user_profile(user_id)
+    user_context = {"user_profile": user_profile.model_dump() if user_profile else None}
         
-        hint_response = hint_svc.get_hint(request, problem, user_context)
+    hint_response = await hint_svc.get_hint(request, problem, user_context)
         
-        # Save hint interaction
-        hint_data = {
-            "level": hint_response.hint.level,
-            "content": hint_response.hint.content,
-            "user_approach": request.user_approach,
-            "feedback": ""
-        }
-        data.save_hint_interaction(user_id, problem, hint_data)
+    # Save hint interaction once the response has been sent
+    hint_data = {
+        "level": hint_response.hint.level,
+        "content": hint_response.hint.content,
+        "user_approach": request.user_approach,
+        "feedback": ""
+    }
+    background_tasks.add_task(data.save_hint_interaction, user_id, problem, hint_data)
         
-        return APIResponse(
-            success=True,
-            message="Hint generated successfully",
-            data=hint_response.model_dump()
-        )
-    except Exception as e:
-        logger.error(f"Error getting hint: {str(e)}")
-        return ErrorResponse(error="Failed to get hint", details=str(e))
+    return APIResponse(
+        success=True,
+        message="Hint generated successfully",
+        data=hint_response.model_dump()
+    )
+
+@app.post("/api/hints/stream")
+async def stream_next_hint(
+    request: HintRequest,
+    user_id: str,
+    hint_svc: HintService = Depends(get_hint_service),
+    data: DataService = Depends(get_data_service)
+):
+    """Stream the next level hint as Server-Sent Events while the model generates it"""
+    problem = request.problem
+    
+    user_profile = data.get_user_profile(user_id)
+    user_context = {"user_profile": user_profile.model_dump() if user_profile else None}
+    
+    async def event_stream():
+        async for event, payload in hint_svc.stream_hint(request, problem, user_context):
+            if event == "hint":
+                yield f"event: hint\ndata: {payload.model_dump_json()}\n\n"
+                hint_data = {
+                    "level": payload.hint.level,
+                    "content": payload.hint.content,
+                    "user_approach": request.user_approach,
+                    "feedback": ""
+                }
+                await asyncio.to_thread(data.save_hint_interaction, user_id, problem, hint_data)
+            else:
+                yield f"event: chunk\ndata: {json.dumps({'text': payload})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 @app.post("/api/hints/personalized")
 async def get_personalized_hint(
     user_approach: str,
     user_id: str,
+    problem: Problem,
     hint_svc: HintService = Depends(get_hint_service),
     data: DataService = Depends(get_data_service)
 ):
     """Get personalized hint based on user approach"""
-    try:
-        user_profile = data.get_user_profile(user_id)
-        user_context = {"user_profile": user_profile.model_dump() if user_profile else None}
+    user_profile = data.get_user_profile(user_id)
+    user_context = {"user_profile": user_profile.model_dump() if user_profile else None}
         
-        # Dummy problem for demo
-        problem = Problem(
-            title="Current Problem",
-            statement="Problem statement would be stored in session",
-            difficulty="Medium",
-            core_concept="Algorithm Practice",
-            context="Generated problem",
-            estimated_time="20 min",
-            complexity="O(n)"
-        )
+    hint_response = await hint_svc.get_personalized_hint(user_approach, problem, user_context)
         
-        hint_response = hint_svc.get_personalized_hint(user_approach, problem, user_context)
-        
-        return APIResponse(
-            success=True,
-            message="Personalized hint generated",
-            data=hint_response.model_dump()
-        )
-    except Exception as e:
-        logger.error(f"Error getting personalized hint: {str(e)}")
-        return ErrorResponse(error="Failed to get personalized hint", details=str(e))
+    return APIResponse(
+        success=True,
+        message="Personalized hint generated",
+        data=hint_response.model_dump()
+    )
 
 # Code Review endpoints
 @app.post("/api/code-review")
 async def review_code(
     request: CodeReviewRequest,
     user_id: str,
+    background_tasks: BackgroundTasks,
     code_review_svc: CodeReviewService = Depends(get_code_review_service),
     data: DataService = Depends(get_data_service)
 ):
     """Review submitted code"""
-    try:
-        user_profile = data.get_user_profile(user_id)
-        user_context = {"user_profile": user_profile.model_dump() if user_profile else None}
+    _check_code_length(request)
+    
+    user_profile = data.get_user_profile(user_id)
+    user_context = {"user_profile": user_profile.model_dump() if user_profile else None}
         
-        review_response = code_review_svc.review_code(request, user_context)
+    review_response = await code_review_svc.review_code(request, user_context)
         
-        # Save review to history
-        review_data = {
-            "language": request.language,
-            "code": request.code,
-            "focus_aspects": request.focus_aspects,
-            "overall_analysis": review_response.overall_analysis.model_dump(),
-            "issues": review_response.issues,
-            "optimizations": review_response.optimizations
-        }
-        data.save_code_review(user_id, review_data)
+    # Save review to history once the response has been sent
+    review_data = _code_review_history_entry(request, review_response)
+    background_tasks.add_task(data.save_code_review, user_id, review_data)
         
-        return APIResponse(
-            success=True,
-            message="Code review completed",
-            data=review_response.model_dump()
+    return APIResponse(
+        success=True,
+        message="Code review completed",
+        data=review_response.model_dump()
+    )
+
+@app.post("/api/code-review/stream")
+async def stream_code_review(
+    request: CodeReviewRequest,
+    user_id: str,
+    code_review_svc: CodeReviewService = Depends(get_code_review_service),
+    data: DataService = Depends(get_data_service)
+):
+    """Stream a code review as Server-Sent Events while the model generates it"""
+    _check_code_length(request)
+    
+    user_profile = data.get_user_profile(user_id)
+    user_context = {"user_profile": user_profile.model_dump() if user_profile else None}
+    
+    async def event_stream():
+        async for event, payload in code_review_svc.stream_review(request, user_context):
+            if event == "review":
+                yield f"event: review\ndata: {payload.model_dump_json()}\n\n"
+                review_data = _code_review_history_entry(request, payload)
+                await asyncio.to_thread(data.save_code_review, user_id, review_data)
+            elif event == "section":
+                yield f"event: section\ndata: {json.dumps({'section': payload})}\n\n"
+            else:
+                yield f"event: chunk\ndata: {json.dumps({'text': payload})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+def _check_code_length(request: CodeReviewRequest):
+    """Reject submissions too large to review before any prompt is built"""
+    if len(request.code) > MAX_CODE_REVIEW_LENGTH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Code exceeds the {MAX_CODE_REVIEW_LENGTH} character review limit"
         )
-    except Exception as e:
-        logger.error(f"Error reviewing code: {str(e)}")
-        return ErrorResponse(error="Failed to review code", details=str(e))
+
+def _code_review_history_entry(request: CodeReviewRequest, review: CodeReviewResponse) -> dict:
+    """Build the code review record saved to the user's history"""
+    return {
+        "language": request.language,
+        "code": request.code,
+        "focus_aspects": request.focus_aspects,
+        "overall_analysis": review.overall_analysis.model_dump(),
+        "issues": review.issues,
+        "optimizations": review.optimizations
+    }
 
 @app.get("/api/users/{user_id}/code-reviews")
 async def get_code_review_history(
@@ -363,17 +405,13 @@ async def get_code_review_history(
     data: DataService = Depends(get_data_service)
 ):
     """Get user's code review history"""
-    try:
-        reviews = data.get_code_review_history(user_id, limit)
+    reviews = data.get_code_review_history(user_id, limit)
         
-        return APIResponse(
-            success=True,
-            message=f"Retrieved {len(reviews)} code reviews",
-            data=reviews
-        )
-    except Exception as e:
-        logger.error(f"Error getting code review history: {str(e)}")
-        return ErrorResponse(error="Failed to get code review history", details=str(e))
+    return APIResponse(
+        success=True,
+        message=f"Retrieved {len(reviews)} code reviews",
+        data=reviews
+    )
 
 # User Progress endpoints
 @app.get("/api/users/{user_id}/progress")
@@ -382,40 +420,32 @@ async def get_user_progress(
     data: DataService = Depends(get_data_service)
 ):
     """Get user progress data"""
-    try:
-        progress = data.get_user_progress(user_id)
-        
-        if progress is None:
-            return APIResponse(
-                success=False,
-                message="User progress not found",
-                data=None
-            )
+    progress = data.get_user_progress(user_id)
         
+    if progress is None:
         return APIResponse(
-            success=True,
-            message="User progress retrieved successfully",
-            data=progress.model_dump()
+            success=False,
+            message="User progress not found",
+            data=None
         )
-    except Exception as e:
-        logger.error(f"Error getting user progress: {str(e)}")
-        return ErrorResponse(error="Failed to get user progress", details=str(e))
+        
+    return APIResponse(
+        success=True,
+        message="User progress retrieved successfully",
+        data=progress.model_dump()
+    )
 
 # System endpoints
 @app.get("/api/system/stats")
 async def get_system_stats(data: DataService = Depends(get_data_service)):
     """Get system statistics"""
-    try:
-        stats = data.get_system_stats()
+    stats = data.get_system_stats()
         
-        return APIResponse(
-            success=True,
-            message="System stats retrieved successfully",
-            data=stats
-        )
-    except Exception as e:
-        logger.error(f"Error getting system stats: {str(e)}")
-        return ErrorResponse(error="Failed to get system stats", details=str(e))
+    return APIResponse(
+        success=True,
+        message="System stats retrieved successfully",
+        data=stats
+    )
 
 if __name__ == "__main__":
     import uvicorn
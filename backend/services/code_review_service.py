@@ -1,22 +1,102 @@
+import re
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Tuple
 from datetime import datetime
 from shared.models import CodeReviewRequest, CodeReviewResponse, CodeAnalysis
 from backend.services.gemini_service import GeminiService
+from shared.config import MAX_CODE_LENGTH
+
+# Section header lines in the model response, e.g. "## 2. ISSUES FOUND:". Numbered
+# headers may use the short form ("1. Overall"); unnumbered ones need the full title.
+SECTION_RE = re.compile(
+    r'^[ \t#*]*(?P<num>\d\.\s*)?\**\s*'
+    r'(?:(?P<overall>overall(?(num)(?: analysis)?| analysis))'
+    r'|(?P<issues>issues(?(num)(?: found)?| found))'
+    r'|(?P<optimizations>optimization(?(num)s?|s))'
+    r'|(?P<alternatives>alternatives?(?: approaches)?))\b.*$',
+    re.IGNORECASE | re.MULTILINE
+)
+# Start of a list item: bullet or "N." prefix at the beginning of a line
+BULLET_RE = re.compile(r'^\s*(?:[-•*]|\d+\.)\s*', re.MULTILINE)
+LINE_BREAK_RE = re.compile(r'\s*\n\s*')
+# "Correctness: 8/10" -> ('Correctness', '8'); skips range bounds like "(score 1-10)"
+SCORE_RE = re.compile(r'(correctness|style)[^\n]*?(?<![-\d])(\d{1,2})(?![-\d])', re.IGNORECASE)
+# "Time complexity: O(n log n)" -> ('Time', 'O(n log n)')
+COMPLEXITY_RE = re.compile(r'(time|space)\s*complexity[^\n]*?\b(O\([^)\n]*\))', re.IGNORECASE)
+
+# Static parts of the code review prompt, built once at import time
+_PROMPT_HEAD = "As DSA-COACH AI, provide a comprehensive code review for this "
+_PROMPT_TAIL = """
+Provide a detailed analysis including:
+
+1. OVERALL ANALYSIS:
+   - Correctness assessment (score 1-10)
+   - Time complexity analysis
+   - Space complexity analysis
+   - Code style rating (1-10)
+   - Brief summary of the solution quality
+
+2. ISSUES FOUND:
+   - Logic errors or bugs
+   - Edge cases not handled
+   - Performance issues
+   - Style/readability problems
+   - Security concerns (if applicable)
+
+3. OPTIMIZATIONS:
+   - Performance improvements
+   - Memory usage optimizations
+   - Cleaner implementation suggestions
+   - Best practice recommendations
+
+4. ALTERNATIVE APPROACHES:
+   - Different algorithms that could work
+   - Trade-offs between approaches
+   - When to use each approach
+   - More elegant or efficient solutions
+
+Be constructive and educational. Explain the 'why' behind your suggestions.
+Format your response with clear section headers.
+"""
+
+# Defaults used when the model response lacks an overall analysis; copied before use
+_DEFAULT_ANALYSIS = CodeAnalysis(
+    correctness_score=7,
+    time_complexity="O(n)",
+    space_complexity="O(1)",
+    style_rating=7,
+    summary="Code analysis completed"
+)
+
+# Review returned when generation fails; only the timestamp varies per request
+_FALLBACK_REVIEW_TEMPLATE = CodeReviewResponse(
+    overall_analysis=CodeAnalysis(
+        correctness_score=6,
+        time_complexity="Unable to analyze",
+        space_complexity="Unable to analyze",
+        style_rating=6,
+        summary="Code review service temporarily unavailable. Please try again later."
+    ),
+    issues=["Unable to analyze issues at this time"],
+    optimizations=["Please resubmit your code for optimization suggestions"],
+    alternatives=["Alternative approaches analysis unavailable"],
+    review_timestamp=datetime.now()
+)
 
 class CodeReviewService:
     def __init__(self, gemini_service: GeminiService):
         self.gemini_service = gemini_service
         self.logger = logging.getLogger(__name__)
     
-    def review_code(self, request: CodeReviewRequest, user_context: Dict[str, Any] = None) -> CodeReviewResponse:
+    async def review_code(self, request: CodeReviewRequest, user_context: Dict[str, Any] = None) -> CodeReviewResponse:
         """Generate comprehensive code review"""
         try:
             prompt = self._generate_code_review_prompt(request)
-            response = self.gemini_service.generate_response(prompt, user_context)
+            response = await self.gemini_service.generate_response_async(prompt, user_context, use_cache=True)
             
             # Parse the response into structured data
-            review_data = self._parse_review_response(response)
+            review_data = await self._parse_review(response)
             
             return CodeReviewResponse(
                 overall_analysis=review_data['overall'],
@@ -30,213 +110,154 @@ class CodeReviewService:
             self.logger.error(f"Error generating code review: {str(e)}")
             return self._get_fallback_review(request)
     
-    def _generate_code_review_prompt(self, request: CodeReviewRequest) -> str:
-        """Generate comprehensive code review prompt"""
-        aspects_text = ', '.join(request.focus_aspects) if request.focus_aspects else "all aspects"
-        
-        prompt = f"""
-        As DSA-COACH AI, provide a comprehensive code review for this {request.language} code:
-        
-        Problem Context: {request.problem_context if request.problem_context else "Not provided"}
-        
-        Code:
-        ```{request.language}
-        {request.code}
-        ```
-        
-        Additional Context: {request.additional_context if request.additional_context else "None"}
-        
-        Focus on these aspects: {aspects_text}
+    async def stream_review(self, request: CodeReviewRequest,
+                            user_context: Dict[str, Any] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream a code review as (event, data) pairs.
         
-        Provide a detailed analysis including:
-        
-        1. OVERALL ANALYSIS:
-           - Correctness assessment (score 1-10)
-           - Time complexity analysis
-           - Space complexity analysis
-           - Code style rating (1-10)
-           - Brief summary of the solution quality
+        Yields ("chunk", text) as model output arrives, ("section", name) when a
+        section header has been received, and finally ("review", CodeReviewResponse).
+        """
+        buffer = ""
+        scanned = 0  # offset of the first line not yet checked for a header
         
-        2. ISSUES FOUND:
-           - Logic errors or bugs
-           - Edge cases not handled
-           - Performance issues
-           - Style/readability problems
-           - Security concerns (if applicable)
+        try:
+            prompt = self._generate_code_review_prompt(request)
+            
+            async for text in self.gemini_service.stream_response_async(prompt, user_context):
+                buffer += text
+                yield "chunk", text
+                
+                # Only complete lines can be classified as headers
+                line_end = buffer.rfind('\n') + 1
+                if line_end > scanned:
+                    for match in SECTION_RE.finditer(buffer, scanned, line_end):
+                        yield "section", match.lastgroup
+                    scanned = line_end
+            
+            for match in SECTION_RE.finditer(buffer, scanned):
+                yield "section", match.lastgroup
+            
+            review_data = await self._parse_review(buffer)
+            review = CodeReviewResponse(
+                overall_analysis=review_data['overall'],
+                issues=review_data['issues'],
+                optimizations=review_data['optimizations'],
+                alternatives=review_data['alternatives'],
+                review_timestamp=datetime.now()
+            )
         
-        3. OPTIMIZATIONS:
-           - Performance improvements
-           - Memory usage optimizations
-           - Cleaner implementation suggestions
-           - Best practice recommendations
+        except Exception as e:
+            self.logger.error(f"Error streaming code review: {str(e)}")
+            review = self._get_fallback_review(request)
         
-        4. ALTERNATIVE APPROACHES:
-           - Different algorithms that could work
-           - Trade-offs between approaches
-           - When to use each approach
-           - More elegant or efficient solutions
+        yield "review", review
+    
+    def _generate_code_review_prompt(self, request: CodeReviewRequest) -> str:
+        """Generate comprehensive code review prompt"""
+        aspects_text = ', '.join(request.focus_aspects) if request.focus_aspects else "all aspects"
+        code = self._truncate_code(request.code)
         
-        Be constructive and educational. Explain the 'why' behind your suggestions.
-        Format your response with clear section headers.
-        """
+        return (
+            f"{_PROMPT_HEAD}{request.language} code:\n\n"
+            f"Problem Context: {request.problem_context or 'Not provided'}\n\n"
+            f"Code:\n```{request.language}\n{code}\n```\n\n"
+            f"Additional Context: {request.additional_context or 'None'}\n\n"
+            f"Focus on these aspects: {aspects_text}\n"
+            f"{_PROMPT_TAIL}"
+        )
+    
+    def _truncate_code(self, code: str) -> str:
+        """Cap the code sent to the model at MAX_CODE_LENGTH characters"""
+        if len(code) <= MAX_CODE_LENGTH:
+            return code
         
-        return prompt
+        dropped = len(code) - MAX_CODE_LENGTH
+        self.logger.info(f"Truncated code review submission by {dropped} characters")
+        return f"{code[:MAX_CODE_LENGTH]}\n... [truncated {dropped} characters] ..."
+    
+    async def _parse_review(self, response: str) -> Dict[str, Any]:
+        """Parse the response in a worker thread so the event loop stays free"""
+        try:
+            return await asyncio.to_thread(self._parse_review_response, response)
+        except Exception as e:
+            self.logger.warning(f"Error parsing review response: {str(e)}")
+            return self._parse_review_response("")
     
     def _parse_review_response(self, response: str) -> Dict[str, Any]:
-        """Parse AI response into structured review data"""
+        """Parse AI response into structured review data.
+        
+        Pure function of the response text, safe to run in a worker thread.
+        """
         sections = {
-            'overall': CodeAnalysis(
-                correctness_score=7,
-                time_complexity="O(n)",
-                space_complexity="O(1)",
-                style_rating=7,
-                summary="Code analysis completed"
-            ),
+            'overall': None,
             'issues': [],
             'optimizations': [],
             'alternatives': []
         }
         
-        try:
-            current_section = None
-            current_content = []
-            
-            lines = response.split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                line_lower = line.lower()
-                
-                # Detect section headers
-                if 'overall analysis' in line_lower or '1.' in line and 'overall' in line_lower:
-                    if current_section and current_content:
-                        sections[current_section] = self._process_section_content(current_section, current_content)
-                    current_section = 'overall'
-                    current_content = []
-                elif 'issues found' in line_lower or '2.' in line and 'issues' in line_lower:
-                    if current_section and current_content:
-                        sections[current_section] = self._process_section_content(current_section, current_content)
-                    current_section = 'issues'
-                    current_content = []
-                elif 'optimizations' in line_lower or '3.' in line and 'optimization' in line_lower:
-                    if current_section and current_content:
-                        sections[current_section] = self._process_section_content(current_section, current_content)
-                    current_section = 'optimizations'
-                    current_content = []
-                elif 'alternative' in line_lower or '4.' in line and 'alternative' in line_lower:
-                    if current_section and current_content:
-                        sections[current_section] = self._process_section_content(current_section, current_content)
-                    current_section = 'alternatives'
-                    current_content = []
-                elif line and current_section:
-                    current_content.append(line)
-            
-            # Handle the last section
-            if current_section and current_content:
-                sections[current_section] = self._process_section_content(current_section, current_content)
+        matches = list(SECTION_RE.finditer(response))
+        
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(response)
+            content = response[match.end():end].strip()
             
-        except Exception as e:
-            self.logger.warning(f"Error parsing review response: {str(e)}")
+            if content:
+                section = match.lastgroup
+                sections[section] = self._process_section_content(section, content)
+        
+        if sections['overall'] is None:
+            sections['overall'] = _DEFAULT_ANALYSIS.model_copy(deep=True)
         
         return sections
     
-    def _process_section_content(self, section: str, content: list) -> Any:
+    def _process_section_content(self, section: str, content: str) -> Any:
         """Process content for each section type"""
         if section == 'overall':
-            return self._parse_overall_section('\n'.join(content))
+            return self._parse_overall_section(LINE_BREAK_RE.sub('\n', content))
         else:
-            return self._parse_list_section('\n'.join(content))
+            return self._parse_list_section(content)
     
     def _parse_overall_section(self, content: str) -> CodeAnalysis:
         """Parse overall analysis section"""
         # Initialize with defaults
-        analysis = CodeAnalysis(
-            correctness_score=7,
-            time_complexity="O(n)",
-            space_complexity="O(1)",
-            style_rating=7,
-            summary=content[:200] + "..." if len(content) > 200 else content
+        analysis = _DEFAULT_ANALYSIS.model_copy(
+            deep=True,
+            update={"summary": content[:200] + "..." if len(content) > 200 else content}
         )
         
-        # Try to extract specific metrics
-        lines = content.split('\n')
-        for line in lines:
-            line_lower = line.lower()
-            
-            if 'correctness' in line_lower and any(char.isdigit() for char in line):
-                try:
-                    score = int(''.join(filter(str.isdigit, line)))
-                    if 1 <= score <= 10:
-                        analysis.correctness_score = score
-                except:
-                    pass
-            
-            elif 'style' in line_lower and any(char.isdigit() for char in line):
-                try:
-                    score = int(''.join(filter(str.isdigit, line)))
-                    if 1 <= score <= 10:
-                        analysis.style_rating = score
-                except:
-                    pass
-            
-            elif 'time complexity' in line_lower:
-                # Extract O() notation
-                if 'o(' in line_lower:
-                    start = line_lower.find('o(')
-                    end = line.find(')', start)
-                    if end != -1:
-                        analysis.time_complexity = line[start:end+1]
-            
-            elif 'space complexity' in line_lower:
-                # Extract O() notation
-                if 'o(' in line_lower:
-                    start = line_lower.find('o(')
-                    end = line.find(')', start)
-                    if end != -1:
-                        analysis.space_complexity = line[start:end+1]
+        # Try to extract specific metrics; the first score/complexity per field wins
+        scores = {}
+        for match in SCORE_RE.finditer(content):
+            scores.setdefault(match.group(1).lower(), int(match.group(2)))
+        
+        if 1 <= scores.get('correctness', 0) <= 10:
+            analysis.correctness_score = scores['correctness']
+        if 1 <= scores.get('style', 0) <= 10:
+            analysis.style_rating = scores['style']
+        
+        complexities = {}
+        for match in COMPLEXITY_RE.finditer(content):
+            complexities.setdefault(match.group(1).lower(), match.group(2))
+        
+        if 'time' in complexities:
+            analysis.time_complexity = complexities['time']
+        if 'space' in complexities:
+            analysis.space_complexity = complexities['space']
         
         return analysis
     
     def _parse_list_section(self, content: str) -> list:
         """Parse sections that contain lists of items"""
         items = []
-        current_item = ""
         
-        lines = content.split('\n')
-        for line in lines:
-            line = line.strip()
-            
-            # Check if line starts a new item (bullet point, number, dash)
-            if line.startswith(('-', '•', '*')) or (line and line[0].isdigit() and '.' in line[:3]):
-                if current_item:
-                    items.append(current_item.strip())
-                current_item = line.lstrip('-•*0123456789. ')
-            elif line and current_item:
-                current_item += " " + line
-            elif line and not current_item:
-                current_item = line
-        
-        # Add the last item
-        if current_item:
-            items.append(current_item.strip())
-        
-        return [item for item in items if item]  # Filter out empty items
+        # Text before the first bullet is kept as its own item
+        for item in BULLET_RE.split(content):
+            item = ' '.join(item.split())
+            if item:
+                items.append(item)
+        
+        return items
     
     def _get_fallback_review(self, request: CodeReviewRequest) -> CodeReviewResponse:
         """Provide fallback review when AI generation fails"""
-        
-        analysis = CodeAnalysis(
-            correctness_score=6,
-            time_complexity="Unable to analyze",
-            space_complexity="Unable to analyze", 
-            style_rating=6,
-            summary="Code review service temporarily unavailable. Please try again later."
-        )
-        
-        return CodeReviewResponse(
-            overall_analysis=analysis,
-            issues=["Unable to analyze issues at this time"],
-            optimizations=["Please resubmit your code for optimization suggestions"],
-            alternatives=["Alternative approaches analysis unavailable"],
-            review_timestamp=datetime.now()
-        )
+        return _FALLBACK_REVIEW_TEMPLATE.model_copy(deep=True, update={"review_timestamp": datetime.now()})
@@ -1,20 +1,67 @@
-import json
 import os
+import time
 import logging
+import threading
+import orjson
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Callable
 from pathlib import Path
+from urllib.parse import quote, unquote
+from pydantic import TypeAdapter
 from shared.models import UserProfile, UserProgress, Problem
-from shared.config import DATA_DIR, USER_PROGRESS_FILE, PROBLEMS_HISTORY_FILE
+from shared.config import (
+    DATA_DIR, USER_PROGRESS_FILE, PROBLEMS_HISTORY_FILE, USERS_DIR, HISTORY_DIR, PROFILE_CACHE_TTL
+)
+
+# Records kept per user in each history log; a log is compacted back to its
+# cap once it grows to twice that
+HISTORY_CAPS = {"problems": 50, "hints": 200, "code_reviews": 100}
+# Serializes a whole list of problems in one call into pydantic-core
+_PROBLEM_LIST_ADAPTER = TypeAdapter(List[Problem])
+# Bytes read per step when scanning a log backwards for its last lines
+_TAIL_CHUNK = 64 * 1024
+# Legacy migration: journal of staged files still to swap in (inside DATA_DIR),
+# and the suffix the migrated legacy files are kept under
+_MIGRATION_JOURNAL = "legacy_migration.journal"
+_MIGRATED_SUFFIX = ".migrated"
 
 class DataService:
     def __init__(self):
         self.data_dir = Path(DATA_DIR)
         self.data_dir.mkdir(exist_ok=True)
         
-        # Data file paths
+        # Legacy single-file stores, only read to migrate them
         self.user_progress_file = self.data_dir / USER_PROGRESS_FILE
         self.problems_history_file = self.data_dir / PROBLEMS_HISTORY_FILE
+        self.users_dir = self.data_dir / USERS_DIR
+        self.history_dir = self.data_dir / HISTORY_DIR
+        
+        # Cache-aside store for user profiles: user_id -> (expires_at, profile)
+        self._profile_cache: Dict[str, Tuple[float, UserProfile]] = {}
+        
+        # Parsed data files: path -> (mtime_ns, data); readers share the cached
+        # objects, so only writers (which parse a private copy) may mutate
+        self._json_cache: Dict[Path, Tuple[int, Dict[str, Any]]] = {}
+        # Line count of each history log, counted on first use and tracked on append
+        self._history_counts: Dict[Path, int] = {}
+        # Last timestamp handed out: (monotonic time, isoformat string)
+        self._ts_cache: Tuple[float, str] = (0.0, '')
+        # Newest-first history reads: (kind, user_id) -> ((mtime_ns, size), limit, records)
+        self._recent_cache: Dict[Tuple[str, str], Tuple[Tuple[int, int], int, List[Dict[str, Any]]]] = {}
+        
+        # Aggregates kept current on write so progress and stats reads are O(1):
+        # per-user flags for retained hints (level > 0) with their running sum,
+        # plus system-wide totals rebuilt once at startup
+        self._hint_levels: Dict[str, deque] = {}
+        self._hints_used: Dict[str, int] = {}
+        self._known_users: set = set()
+        self._total_problems_generated = 0
+        
+        # Serializes read-modify-write cycles on the JSON files; saves may run
+        # on FastAPI's threadpool after the response has been sent
+        self._write_lock = threading.RLock()
         
         self.logger = logging.getLogger(__name__)
         self._initialize_data_files()
@@ -22,164 +69,388 @@ class DataService:
     def _initialize_data_files(self):
         """Initialize data files with empty structures if they don't exist"""
         try:
-            if not self.user_progress_file.exists():
-                initial_progress = {}
-                self._save_json(self.user_progress_file, initial_progress)
+            self.users_dir.mkdir(exist_ok=True)
+            for kind in HISTORY_CAPS:
+                (self.history_dir / kind).mkdir(parents=True, exist_ok=True)
             
-            if not self.problems_history_file.exists():
-                initial_problems = {}
-                self._save_json(self.problems_history_file, initial_problems)
+            self._migrate_legacy_files()
+            self._rebuild_counters()
                 
             self.logger.info("Data files initialized successfully")
         
         except Exception as e:
-            self.logger.error(f"Error initializing data files: {str(e)}")
+            self.logger.error("Error initializing data files: %s", e)
             raise
     
-    def _load_json(self, file_path: Path) -> Dict[str, Any]:
-        """Load JSON data from file"""
+    def _load_json(self, file_path: Path, cached: bool = True) -> Dict[str, Any]:
+        """Load JSON data from file, reusing the parsed copy while the file is unchanged.
+        
+        Callers that mutate the result must pass cached=False to get a private copy.
+        """
         try:
             if file_path.exists():
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                mtime = file_path.stat().st_mtime_ns
+                if cached:
+                    entry = self._json_cache.get(file_path)
+                    if entry and entry[0] == mtime:
+                        return entry[1]
+                
+                data = orjson.loads(file_path.read_bytes())
+                if cached:
+                    self._json_cache[file_path] = (mtime, data)
+                return data
             return {}
         except Exception as e:
-            self.logger.error(f"Error loading {file_path}: {str(e)}")
+            self.logger.error("Error loading %s: %s", file_path, e)
             return {}
     
+    def _write_atomic(self, file_path: Path, payload: bytes):
+        """Write a sibling temp file and swap it in, so a crash mid-write
+        never leaves a truncated data file behind"""
+        tmp_path = file_path.with_suffix(file_path.suffix + '.tmp')
+        with open(tmp_path, 'wb', buffering=1 << 20) as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    
     def _save_json(self, file_path: Path, data: Dict[str, Any]):
         """Save JSON data to file"""
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+            with self._write_lock:
+                # datetimes and enums are native to orjson; str() covers anything else
+                self._write_atomic(file_path, orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2))
+                # The written data becomes the cached copy, sparing the next read a parse
+                self._json_cache[file_path] = (file_path.stat().st_mtime_ns, data)
         except Exception as e:
-            self.logger.error(f"Error saving {file_path}: {str(e)}")
+            self._json_cache.pop(file_path, None)
+            self.logger.error("Error saving %s: %s", file_path, e)
             raise
     
+    def _update_json(self, file_path: Path, mutate: Callable[[Dict[str, Any]], None]):
+        """Apply an in-place mutation to a data file as one locked read-modify-write"""
+        with self._write_lock:
+            data = self._load_json(file_path, cached=False)
+            mutate(data)
+            self._save_json(file_path, data)
+    
+    # Per-user Files
+    def _user_path(self, user_id: str) -> Path:
+        """Path of a user's profile/favorites file; the user id is quoted to keep it filename-safe"""
+        return self.users_dir / f"{quote(user_id, safe='')}.json"
+    
+    def _load_user(self, user_id: str) -> Dict[str, Any]:
+        """Load one user's data without touching anyone else's"""
+        return self._load_json(self._user_path(user_id))
+    
+    def _update_user(self, user_id: str, mutate: Callable[[Dict[str, Any]], None]):
+        """Read-modify-write one user's data file"""
+        self._update_json(self._user_path(user_id), mutate)
+    
+    # History Logs
+    def _history_path(self, kind: str, user_id: str) -> Path:
+        """Path of a user's history log; the user id is quoted to keep it filename-safe"""
+        return self.history_dir / kind / f"{quote(user_id, safe='')}.jsonl"
+    
+    def _history_count(self, file_path: Path) -> int:
+        """Number of records currently in a history log"""
+        count = self._history_counts.get(file_path)
+        if count is None:
+            count = file_path.read_bytes().count(b'\n') if file_path.exists() else 0
+            self._history_counts[file_path] = count
+        return count
+    
+    def _append_history(self, kind: str, user_id: str, record: Dict[str, Any]):
+        """Append one record to a user's history log without rewriting earlier ones"""
+        file_path = self._history_path(kind, user_id)
+        cap = HISTORY_CAPS[kind]
+        
+        with self._write_lock:
+            count = self._history_count(file_path)
+            with open(file_path, 'ab') as f:
+                f.write(orjson.dumps(record, default=str) + b'\n')
+            self._history_counts[file_path] = count + 1
+            
+            self._known_users.add(user_id)
+            if kind == "problems" and count < cap:
+                self._total_problems_generated += 1
+            elif kind == "hints" and user_id in self._hint_levels:
+                self._track_hint_level(user_id, record.get('hint_level', 0) > 0)
+            
+            if count + 1 >= 2 * cap:
+                self._write_history(file_path, self._tail_lines(file_path, cap))
+    
+    def _write_history(self, file_path: Path, lines: List[bytes]):
+        """Replace a history log with the given lines"""
+        with self._write_lock:
+            self._write_atomic(file_path, b''.join(line + b'\n' for line in lines))
+            self._history_counts[file_path] = len(lines)
+    
+    def _tail_lines(self, file_path: Path, n: int) -> List[bytes]:
+        """Read the last n lines of a file, scanning backwards from the end"""
+        if n <= 0 or not file_path.exists():
+            return []
+        
+        with open(file_path, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            data = b''
+            # n + 1 newlines guarantee the first of the last n lines is complete
+            while pos > 0 and data.count(b'\n') <= n:
+                step = min(_TAIL_CHUNK, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+        
+        return data.splitlines()[-n:]
+    
+    def _read_history(self, kind: str, user_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Read up to `limit` (default: the cap) most recent records, oldest first"""
+        if limit is None:
+            limit = HISTORY_CAPS[kind]
+        
+        records = []
+        for line in self._tail_lines(self._history_path(kind, user_id), limit):
+            try:
+                records.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                # A torn final line from an interrupted append
+                continue
+        return records
+    
+    def _recent_history(self, kind: str, user_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Most recent records first, memoized until the log changes"""
+        file_path = self._history_path(kind, user_id)
+        if not file_path.exists():
+            return []
+        
+        # Appends always grow the file, so size catches writes within one mtime tick
+        st = file_path.stat()
+        version = (st.st_mtime_ns, st.st_size)
+        cached = self._recent_cache.get((kind, user_id))
+        if cached and cached[0] == version and cached[1] == limit:
+            return cached[2]
+        
+        # The log is in chronological order, so no sort is needed
+        records = self._read_history(kind, user_id, limit)[::-1]
+        self._recent_cache[(kind, user_id)] = (version, limit, records)
+        return records
+    
+    def _track_hint_level(self, user_id: str, used: bool):
+        """Slide a user's retained-hint window forward by one record"""
+        levels = self._hint_levels[user_id]
+        if len(levels) == levels.maxlen:
+            self._hints_used[user_id] -= levels[0]
+        levels.append(used)
+        self._hints_used[user_id] += used
+    
+    def _hint_stats(self, user_id: str) -> Tuple[int, int]:
+        """Retained hint interactions and how many of them used a hint, for one user"""
+        with self._write_lock:
+            if user_id not in self._hint_levels:
+                # One pass over the records; the count itself runs in C
+                levels = deque(
+                    [h.get('hint_level', 0) > 0 for h in self._read_history("hints", user_id)],
+                    maxlen=HISTORY_CAPS["hints"]
+                )
+                self._hint_levels[user_id] = levels
+                self._hints_used[user_id] = levels.count(True)
+            return len(self._hint_levels[user_id]), self._hints_used[user_id]
+    
+    def _rebuild_counters(self):
+        """Recompute the system-wide totals from the data on disk"""
+        with self._write_lock:
+            users = {unquote(file_path.stem) for file_path in self.users_dir.glob('*.json')}
+            total_problems_generated = 0
+            for kind, cap in HISTORY_CAPS.items():
+                for file_path in (self.history_dir / kind).glob('*.jsonl'):
+                    users.add(unquote(file_path.stem))
+                    if kind == "problems":
+                        total_problems_generated += min(self._history_count(file_path), cap)
+            
+            self._known_users = users
+            self._total_problems_generated = total_problems_generated
+            self._hint_levels.clear()
+            self._hints_used.clear()
+    
+    def _migrate_legacy_files(self):
+        """Split the legacy single-file stores into per-user files and history logs.
+        
+        Every output is staged beside its target and listed in a journal before any
+        target is replaced, and the legacy files are kept as *.migrated. A crash
+        before the journal is written leaves the live files untouched, and one after
+        it is finished by the next start, so no record is ever applied twice.
+        """
+        with self._write_lock:
+            journal_path = self.data_dir / _MIGRATION_JOURNAL
+            if not journal_path.exists():
+                journal = self._stage_legacy_migration()
+                if journal is None:
+                    return
+                self._write_atomic(journal_path, orjson.dumps(journal))
+            
+            journal = orjson.loads(journal_path.read_bytes())
+            for staged, target in journal["files"]:
+                if os.path.exists(staged):
+                    os.replace(staged, target)
+            for legacy in journal["legacy"]:
+                if os.path.exists(legacy):
+                    os.replace(legacy, legacy + _MIGRATED_SUFFIX)
+            journal_path.unlink()
+            
+            self.logger.info("Migrated legacy data files to per-user storage")
+    
+    def _stage_legacy_migration(self) -> Optional[Dict[str, List]]:
+        """Write the migrated files next to their targets; returns the journal, or None if nothing to migrate"""
+        legacy_files = [path for path in (self.user_progress_file, self.problems_history_file) if path.exists()]
+        if not legacy_files:
+            return None
+        
+        outputs: Dict[Path, bytes] = {}
+        if self.user_progress_file.exists():
+            for user_id, user_data in self._load_json(self.user_progress_file, cached=False).items():
+                for kind, key in (("hints", "hint_history"), ("code_reviews", "code_reviews")):
+                    records = user_data.pop(key, [])
+                    if records:
+                        outputs[self._history_path(kind, user_id)] = self._prepended_history(kind, user_id, records)
+                if user_data:
+                    # Anything already in the per-user file is newer than the legacy copy
+                    user_path = self._user_path(user_id)
+                    merged = {**user_data, **self._load_json(user_path, cached=False)}
+                    outputs[user_path] = orjson.dumps(merged, default=str, option=orjson.OPT_INDENT_2)
+        
+        if self.problems_history_file.exists():
+            for user_id, sessions in self._load_json(self.problems_history_file, cached=False).items():
+                if sessions:
+                    outputs[self._history_path("problems", user_id)] = self._prepended_history("problems", user_id, sessions)
+        
+        files = []
+        for target, payload in outputs.items():
+            staged = target.with_suffix(target.suffix + '.migrating')
+            self._write_atomic(staged, payload)
+            files.append((str(staged), str(target)))
+        return {"files": files, "legacy": [str(path) for path in legacy_files]}
+    
+    def _prepended_history(self, kind: str, user_id: str, records: List[Dict[str, Any]]) -> bytes:
+        """A user's log with older records inserted ahead of its current contents, capped"""
+        file_path = self._history_path(kind, user_id)
+        lines = deque((orjson.dumps(record, default=str) for record in records), maxlen=HISTORY_CAPS[kind])
+        if file_path.exists():
+            lines.extend(file_path.read_bytes().splitlines())
+        return b''.join(line + b'\n' for line in lines)
+    
     def get_current_timestamp(self) -> str:
-        """Get current timestamp as string"""
-        return datetime.now().isoformat()
+        """Get current timestamp as string, reused for calls within the same millisecond"""
+        now = time.monotonic()
+        cached = self._ts_cache
+        if now - cached[0] < 0.001:
+            return cached[1]
+        
+        timestamp = datetime.now().isoformat()
+        self._ts_cache = (now, timestamp)
+        return timestamp
     
     # User Profile Management
     def get_user_profile(self, user_id: str) -> Optional[UserProfile]:
         """Get user profile data"""
+        cached = self._profile_cache.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
         try:
-            progress_data = self._load_json(self.user_progress_file)
-            profile_data = progress_data.get(user_id, {}).get('profile', {})
+            profile_data = self._load_user(user_id).get('profile', {})
             
             if profile_data:
-                return UserProfile(**profile_data)
+                profile = UserProfile(**profile_data)
+                self._profile_cache[user_id] = (time.monotonic() + PROFILE_CACHE_TTL, profile)
+                return profile
             return None
         except Exception as e:
-            self.logger.error(f"Error getting user profile for {user_id}: {str(e)}")
+            self.logger.error("Error getting user profile for %s: %s", user_id, e)
             return None
     
     def update_user_profile(self, user_id: str, profile: UserProfile) -> bool:
         """Update user profile"""
         try:
-            progress_data = self._load_json(self.user_progress_file)
-            
-            if user_id not in progress_data:
-                progress_data[user_id] = {}
-            
-            profile.updated_at = datetime.now()
+            now = datetime.now()
+            profile.updated_at = now
             if not profile.created_at:
-                profile.created_at = datetime.now()
+                profile.created_at = now
+            
+            profile_data = profile.model_dump()
+            last_updated = self.get_current_timestamp()
             
-            progress_data[user_id]['profile'] = profile.model_dump()
-            progress_data[user_id]['last_updated'] = self.get_current_timestamp()
+            def mutate(user_data: Dict[str, Any]):
+                user_data['profile'] = profile_data
+                user_data['last_updated'] = last_updated
             
-            self._save_json(self.user_progress_file, progress_data)
-            self.logger.info(f"Updated profile for user {user_id}")
+            self._update_user(user_id, mutate)
+            self._profile_cache.pop(user_id, None)
+            self._known_users.add(user_id)
+            self.logger.info("Updated profile for user %s", user_id)
             return True
-        
+            
         except Exception as e:
-            self.logger.error(f"Error updating user profile for {user_id}: {str(e)}")
+            self.logger.error("Error updating user profile for %s: %s", user_id, e)
             return False
     
     # Problem Generation History
     def save_generated_problems(self, user_id: str, original_problem: str, problems: List[Problem]) -> bool:
         """Save generated problem variations"""
         try:
-            problems_data = self._load_json(self.problems_history_file)
-            
-            if user_id not in problems_data:
-                problems_data[user_id] = []
-            
             problem_session = {
                 'timestamp': self.get_current_timestamp(),
                 'original_problem': original_problem,
-                'variations': [problem.model_dump() for problem in problems],
-                'session_id': len(problems_data[user_id]) + 1
+                'variations': _PROBLEM_LIST_ADAPTER.dump_python(problems, mode='json')
             }
             
-            problems_data[user_id].append(problem_session)
-            
-            # Keep only last 50 sessions per user
-            if len(problems_data[user_id]) > 50:
-                problems_data[user_id] = problems_data[user_id][-50:]
+            with self._write_lock:
+                # Numbered within the sessions kept for the user
+                count = self._history_count(self._history_path("problems", user_id))
+                problem_session['session_id'] = min(count, HISTORY_CAPS["problems"]) + 1
+                self._append_history("problems", user_id, problem_session)
             
-            self._save_json(self.problems_history_file, problems_data)
-            self.logger.info(f"Saved {len(problems)} problems for user {user_id}")
+            self.logger.info("Saved %d problems for user %s", len(problems), user_id)
             return True
-            
+                
         except Exception as e:
-            self.logger.error(f"Error saving problems for {user_id}: {str(e)}")
+            self.logger.error("Error saving problems for %s: %s", user_id, e)
             return False
     
     def get_recent_problems(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent problem generations"""
         try:
-            problems_data = self._load_json(self.problems_history_file)
-            user_problems = problems_data.get(user_id, [])
-            
-            # Return most recent sessions
-            return sorted(user_problems, key=lambda x: x['timestamp'], reverse=True)[:limit]
+            return self._recent_history("problems", user_id, limit)
         
         except Exception as e:
-            self.logger.error(f"Error getting recent problems for {user_id}: {str(e)}")
+            self.logger.error("Error getting recent problems for %s: %s", user_id, e)
             return []
     
     def add_to_favorites(self, user_id: str, problem: Problem) -> bool:
         """Add problem to user's favorites"""
         try:
-            progress_data = self._load_json(self.user_progress_file)
-            
-            if user_id not in progress_data:
-                progress_data[user_id] = {}
-            
-            if 'favorites' not in progress_data[user_id]:
-                progress_data[user_id]['favorites'] = []
-            
             problem_data = problem.model_dump()
             problem_data['favorited_at'] = self.get_current_timestamp()
             
-            progress_data[user_id]['favorites'].append(problem_data)
-            
-            # Keep only last 100 favorites
-            if len(progress_data[user_id]['favorites']) > 100:
-                progress_data[user_id]['favorites'] = progress_data[user_id]['favorites'][-100:]
+            def mutate(user_data: Dict[str, Any]):
+                favorites = user_data.setdefault('favorites', [])
+                favorites.append(problem_data)
+                
+                # Keep only last 100 favorites, trimming in place
+                del favorites[:-100]
             
-            self._save_json(self.user_progress_file, progress_data)
-            self.logger.info(f"Added problem to favorites for user {user_id}")
+            self._update_user(user_id, mutate)
+            self._known_users.add(user_id)
+            self.logger.info("Added problem to favorites for user %s", user_id)
             return True
-            
+                
         except Exception as e:
-            self.logger.error(f"Error adding to favorites for {user_id}: {str(e)}")
+            self.logger.error("Error adding to favorites for %s: %s", user_id, e)
             return False
     
     # Hint System
     def save_hint_interaction(self, user_id: str, problem: Problem, hint_data: Dict[str, Any]) -> bool:
         """Save hint interaction"""
         try:
-            progress_data = self._load_json(self.user_progress_file)
-            
-            if user_id not in progress_data:
-                progress_data[user_id] = {}
-            
-            if 'hint_history' not in progress_data[user_id]:
-                progress_data[user_id]['hint_history'] = []
-            
             interaction = {
                 'timestamp': self.get_current_timestamp(),
                 'problem_title': problem.title if problem else 'Unknown',
@@ -189,31 +460,17 @@ class DataService:
                 'feedback': hint_data.get('feedback', '')
             }
             
-            progress_data[user_id]['hint_history'].append(interaction)
-            
-            # Keep only last 200 interactions
-            if len(progress_data[user_id]['hint_history']) > 200:
-                progress_data[user_id]['hint_history'] = progress_data[user_id]['hint_history'][-200:]
-            
-            self._save_json(self.user_progress_file, progress_data)
+            self._append_history("hints", user_id, interaction)
             return True
-            
+                
         except Exception as e:
-            self.logger.error(f"Error saving hint interaction for {user_id}: {str(e)}")
+            self.logger.error("Error saving hint interaction for %s: %s", user_id, e)
             return False
     
     # Code Review
     def save_code_review(self, user_id: str, review_data: Dict[str, Any]) -> bool:
         """Save code review session"""
         try:
-            progress_data = self._load_json(self.user_progress_file)
-            
-            if user_id not in progress_data:
-                progress_data[user_id] = {}
-            
-            if 'code_reviews' not in progress_data[user_id]:
-                progress_data[user_id]['code_reviews'] = []
-            
             review_session = {
                 'timestamp': self.get_current_timestamp(),
                 'language': review_data.get('language', ''),
@@ -224,45 +481,31 @@ class DataService:
                 'optimizations_count': len(review_data.get('optimizations', []))
             }
             
-            progress_data[user_id]['code_reviews'].append(review_session)
-            
-            # Keep only last 100 reviews
-            if len(progress_data[user_id]['code_reviews']) > 100:
-                progress_data[user_id]['code_reviews'] = progress_data[user_id]['code_reviews'][-100:]
-            
-            self._save_json(self.user_progress_file, progress_data)
+            self._append_history("code_reviews", user_id, review_session)
             return True
-            
+                
         except Exception as e:
-            self.logger.error(f"Error saving code review for {user_id}: {str(e)}")
+            self.logger.error("Error saving code review for %s: %s", user_id, e)
             return False
     
     def get_code_review_history(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get code review history"""
         try:
-            progress_data = self._load_json(self.user_progress_file)
-            code_reviews = progress_data.get(user_id, {}).get('code_reviews', [])
-            
-            return sorted(code_reviews, key=lambda x: x['timestamp'], reverse=True)[:limit]
+            return self._recent_history("code_reviews", user_id, limit)
         
         except Exception as e:
-            self.logger.error(f"Error getting code review history for {user_id}: {str(e)}")
+            self.logger.error("Error getting code review history for %s: %s", user_id, e)
             return []
     
     # Progress Tracking
     def get_user_progress(self, user_id: str) -> Optional[UserProgress]:
         """Get comprehensive user progress data"""
         try:
-            progress_data = self._load_json(self.user_progress_file)
-            user_data = progress_data.get(user_id, {})
+            user_data = self._load_user(user_id)
             
             if not user_data:
                 return None
             
-            # Calculate progress metrics
-            total_problems = len(user_data.get('hint_history', []))
-            total_hints = sum(1 for h in user_data.get('hint_history', []) if h.get('hint_level', 0) > 0)
-            
             # Get profile
             profile_data = user_data.get('profile', {})
             if not profile_data:
@@ -270,20 +513,29 @@ class DataService:
             
             profile = UserProfile(**profile_data)
             
+            # Calculate progress metrics
+            total_problems, total_hints = self._hint_stats(user_id)
+            reviews_count = min(
+                self._history_count(self._history_path("code_reviews", user_id)),
+                HISTORY_CAPS["code_reviews"]
+            )
+            
+            last_updated = user_data.get('last_updated')
+            
             progress = UserProgress(
                 user_id=user_id,
                 profile=profile,
                 total_problems_solved=total_problems,
                 total_hints_used=total_hints,
-                last_activity=datetime.fromisoformat(user_data.get('last_updated', datetime.now().isoformat())),
+                last_activity=datetime.fromisoformat(last_updated) if last_updated else datetime.now(),
                 topic_performance=self._analyze_topic_performance(user_data),
-                achievements=self._calculate_achievements(user_data)
+                achievements=self._calculate_achievements(total_problems, reviews_count)
             )
             
             return progress
             
         except Exception as e:
-            self.logger.error(f"Error getting user progress for {user_id}: {str(e)}")
+            self.logger.error("Error getting user progress for %s: %s", user_id, e)
             return None
     
     def _analyze_topic_performance(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -296,12 +548,11 @@ class DataService:
             "graphs": {"score": 80, "problems_solved": 8}
         }
     
-    def _calculate_achievements(self, user_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _calculate_achievements(self, problems_solved: int, reviews_count: int) -> List[Dict[str, Any]]:
         """Calculate user achievements"""
         achievements = []
         
         # Problem solving achievements
-        problems_solved = len(user_data.get('hint_history', []))
         if problems_solved >= 10:
             achievements.append({
                 "id": "first_10_problems",
@@ -311,7 +562,6 @@ class DataService:
             })
         
         # Code review achievements
-        reviews_count = len(user_data.get('code_reviews', []))
         if reviews_count >= 5:
             achievements.append({
                 "id": "code_reviewer",
@@ -326,34 +576,37 @@ class DataService:
     def export_user_data(self, user_id: str) -> Dict[str, Any]:
         """Export all user data"""
         try:
-            progress_data = self._load_json(self.user_progress_file)
-            problems_data = self._load_json(self.problems_history_file)
-            
-            return {
-                "user_progress": progress_data.get(user_id, {}),
-                "problems_history": problems_data.get(user_id, []),
-                "exported_at": self.get_current_timestamp()
-            }
+            # The user file and the three logs are independent reads; overlap them
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                user_data = executor.submit(self._load_user, user_id)
+                hints = executor.submit(self._read_history, "hints", user_id)
+                reviews = executor.submit(self._read_history, "code_reviews", user_id)
+                problems = executor.submit(self._read_history, "problems", user_id)
+                
+                return {
+                    "user_progress": {
+                        **user_data.result(),
+                        "hint_history": hints.result(),
+                        "code_reviews": reviews.result()
+                    },
+                    "problems_history": problems.result(),
+                    "exported_at": self.get_current_timestamp()
+                }
             
         except Exception as e:
-            self.logger.error(f"Error exporting data for {user_id}: {str(e)}")
+            self.logger.error("Error exporting data for %s: %s", user_id, e)
             return {}
     
     def get_system_stats(self) -> Dict[str, Any]:
         """Get system-wide statistics"""
         try:
-            progress_data = self._load_json(self.user_progress_file)
-            problems_data = self._load_json(self.problems_history_file)
-            
-            total_users = len(progress_data)
-            total_problems_generated = sum(len(sessions) for sessions in problems_data.values())
-            
             return {
-                "total_users": total_users,
-                "total_problems_generated": total_problems_generated,
+                # Users with a profile or any recorded history
+                "total_users": len(self._known_users),
+                "total_problems_generated": self._total_problems_generated,
                 "last_updated": self.get_current_timestamp()
             }
             
         except Exception as e:
-            self.logger.error(f"Error getting system stats: {str(e)}")
+            self.logger.error("Error getting system stats: %s", e)
             return {}
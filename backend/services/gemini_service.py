@@ -1,18 +1,76 @@
 import os
-import logging
+import json
 import time
-import google.generativeai as genai
-from typing import Optional, Dict, Any
-from shared.config import GEMINI_API_KEY, GEMINI_MODEL_NAME, MAX_RETRIES, RETRY_DELAY
+import asyncio
+import logging
+import httpx
+from aiolimiter import AsyncLimiter
+from tenacity import (
+    retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception, before_sleep_log
+)
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
+from shared.config import (
+    GEMINI_API_KEYS, GEMINI_KEY_RPM, GEMINI_MODEL_NAME, GEMINI_API_BASE_URL, GEMINI_REQUEST_TIMEOUT,
+    GEMINI_MAX_CONNECTIONS, GEMINI_MAX_KEEPALIVE_CONNECTIONS, GEMINI_PREWARM_CONNECTIONS,
+    GEMINI_CONNECTION_CHECK_TTL, MAX_RETRIES, RETRY_DELAY,
+    RETRY_MAX_DELAY, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES, CIRCUIT_BREAKER_THRESHOLD,
+    CIRCUIT_BREAKER_COOLDOWN
+)
+
+logger = logging.getLogger(__name__)
+
+class GeminiUnavailableError(Exception):
+    """Raised without calling the API while the circuit breaker is open"""
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Retry network failures, rate limiting and server errors, not client errors"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+# Coach preamble sent as the system instruction with every request
+_SYSTEM_CONTEXT = """
+You are DSA-COACH AI, an intelligent coding mentor specializing in Data Structures and Algorithms. Your role is to help students master DSA concepts through guided practice, avoiding solution dependency.
+
+Core principles:
+- Focus on understanding over memorization
+- Provide progressive hints without revealing complete solutions
+- Encourage independent thinking through guided questions
+- Be patient, encouraging, and adapt to the user's level
+- Connect new problems to previously learned concepts
+- Build intuition through analogies and examples
+
+Always maintain a supportive and educational tone. Guide users to discover solutions independently while building lasting DSA intuition.
+"""
+_SYSTEM_INSTRUCTION = {"parts": [{"text": _SYSTEM_CONTEXT}]}
 
 class GeminiService:
     def __init__(self):
-        self.api_key = GEMINI_API_KEY
+        self.api_keys: List[str] = list(GEMINI_API_KEYS)
+        self.api_key = self.api_keys[0] if self.api_keys else ""
         self.model_name = GEMINI_MODEL_NAME
-        self.model = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.generation_config: Dict[str, Any] = {}
+        self.safety_settings: list = []
         self.max_retries = MAX_RETRIES
         self.retry_delay = RETRY_DELAY
         
+        # LRU of prompt hash -> (expires_at, response text)
+        self._response_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Requests currently in flight, so concurrent identical prompts share one call
+        self._inflight: Dict[str, "asyncio.Task[str]"] = {}
+        # Per-key request rate limiters; calls go to a key with spare capacity
+        self._key_limiters: List[Tuple[str, AsyncLimiter]] = []
+        self._next_key = 0
+        # Circuit breaker: consecutive transient failures, and when calls may resume
+        self._consecutive_failures = 0
+        self._breaker_open_until = 0.0
+        # Status endpoint results: when the last connection test passed, and model info
+        self._last_ok_at: Optional[float] = None
+        self._model_info: Optional[Dict[str, Any]] = None
+        
         self.logger = logging.getLogger(__name__)
         self._initialize_client()
     
@@ -36,122 +94,371 @@ class GeminiService:
                 self.logger.error("GOOGLE_API_KEY not found in environment variables")
                 return
             
-            genai.configure(api_key=self.api_key)
+            if self.api_key not in self.api_keys:
+                self.api_keys.insert(0, self.api_key)
+            self._key_limiters = [(key, AsyncLimiter(GEMINI_KEY_RPM, 60)) for key in self.api_keys]
             
-            generation_config = {
+            self.generation_config = {
                 "temperature": 0.7,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 4096,
+                "topP": 0.8,
+                "topK": 40,
+                "maxOutputTokens": 4096,
             }
             
-            safety_settings = [
+            self.safety_settings = [
                 {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
                 {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
                 {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
                 {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
             ]
             
-            self.model = genai.GenerativeModel(
-                model_name=self.model_name,
-                generation_config=generation_config,
-                safety_settings=safety_settings
+            # One pooled keep-alive client shared by every request, so the
+            # TCP/TLS handshake is paid once per connection rather than per call
+            self.client = httpx.AsyncClient(
+                base_url=GEMINI_API_BASE_URL,
+                limits=httpx.Limits(
+                    max_connections=GEMINI_MAX_CONNECTIONS,
+                    max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS
+                ),
+                timeout=httpx.Timeout(GEMINI_REQUEST_TIMEOUT),
+                http2=True
             )
             
-            self.logger.info(f"Gemini client initialized successfully with model: {self.model_name}")
+            self.logger.info("Gemini client initialized successfully with model: %s", self.model_name)
             
         except Exception as e:
-            self.logger.error(f"Failed to initialize Gemini client: {str(e)}")
-            self.model = None
+            self.logger.error("Failed to initialize Gemini client: %s", e)
+            self.client = None
+    
+    async def prewarm(self):
+        """Open pooled connections to the Gemini API before the first user request"""
+        if not self.client:
+            return
+        
+        async def _ping():
+            response = await self.client.get(
+                f"/models/{self.model_name}",
+                headers={"x-goog-api-key": self.api_key}
+            )
+            response.raise_for_status()
+        
+        results = await asyncio.gather(
+            *(_ping() for _ in range(GEMINI_PREWARM_CONNECTIONS)),
+            return_exceptions=True
+        )
+        failures = [r for r in results if isinstance(r, Exception)]
+        if failures:
+            self.logger.warning("Gemini connection prewarm failed: %s", failures[0])
+        else:
+            self.logger.info("Prewarmed %d Gemini connection(s)", len(results))
+    
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+    
+    def _select_key(self) -> Tuple[str, AsyncLimiter]:
+        """Pick the next API key with spare rate-limit capacity, round robin"""
+        count = len(self._key_limiters)
+        for offset in range(count):
+            index = (self._next_key + offset) % count
+            if self._key_limiters[index][1].has_capacity():
+                self._next_key = index + 1
+                return self._key_limiters[index]
+        
+        # Every key is saturated; queue on the next one in turn
+        index = self._next_key % count
+        self._next_key = index + 1
+        return self._key_limiters[index]
+    
+    def _build_payload(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the generateContent request body for a single-turn prompt.
+        
+        With a response schema the model is constrained to JSON matching it.
+        """
+        generation_config = self.generation_config
+        if response_schema is not None:
+            generation_config = {
+                **generation_config,
+                "responseMimeType": "application/json",
+                "responseSchema": response_schema,
+            }
+        
+        return {
+            "systemInstruction": _SYSTEM_INSTRUCTION,
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": generation_config,
+            "safetySettings": self.safety_settings,
+        }
+    
+    @staticmethod
+    def _extract_text(body: Dict[str, Any]) -> str:
+        """Extract the text of the first candidate from a generateContent response"""
+        candidates = body.get("candidates") or []
+        if not candidates:
+            return ""
+        
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+    
+    def _check_circuit(self):
+        """Fail fast while the API is known to be down"""
+        if time.monotonic() < self._breaker_open_until:
+            raise GeminiUnavailableError("Gemini API temporarily unavailable, please try again shortly")
+    
+    def _record_failure(self, exc: Exception):
+        """Count a transient failure, opening the circuit after too many in a row"""
+        if not _is_retryable(exc):
+            return
+        
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= CIRCUIT_BREAKER_THRESHOLD:
+            self._breaker_open_until = time.monotonic() + CIRCUIT_BREAKER_COOLDOWN
+            self._consecutive_failures = 0
+            self.logger.warning("Gemini circuit breaker open for %ss after repeated failures", CIRCUIT_BREAKER_COOLDOWN)
+    
+    async def _generate_content(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Call the Gemini generateContent REST endpoint and return the response text"""
+        self._check_circuit()
+        api_key, limiter = self._select_key()
+        await limiter.acquire()
+        
+        try:
+            response = await self.client.post(
+                f"/models/{self.model_name}:generateContent",
+                json=self._build_payload(prompt, response_schema),
+                headers={"x-goog-api-key": api_key}
+            )
+            response.raise_for_status()
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        
+        self._consecutive_failures = 0
+        return self._extract_text(response.json())
     
-    def generate_response(self, prompt: str, context: Optional[Dict[str, Any]] = None) -> str:
-        """Generate response from Gemini model with retry logic"""
-        if not self.model:
+    async def stream_response_async(self, prompt: str,
+                                    context: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Stream response text from Gemini as it is generated"""
+        if not self.client:
             raise Exception("Gemini client not initialized. Please check your API key.")
         
         enhanced_prompt = self._enhance_prompt_with_context(prompt, context or {})
+        chunks, first = await self._open_stream(enhanced_prompt)
         
-        for attempt in range(self.max_retries):
-            try:
-                response = self.model.generate_content(enhanced_prompt)
-                
-                if response and hasattr(response, 'text') and response.text:
-                    self.logger.info(f"Generated response successfully on attempt {attempt + 1}")
-                    return response.text.strip()
-                else:
-                    raise Exception("Empty response from Gemini")
-            
-            except Exception as e:
-                self.logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
+        try:
+            if first:
+                yield first
+            async for text in chunks:
+                yield text
+        finally:
+            await chunks.aclose()
+    
+    @retry(
+        stop=stop_after_attempt(MAX_RETRIES),
+        wait=wait_exponential_jitter(initial=RETRY_DELAY, max=RETRY_MAX_DELAY),
+        retry=retry_if_exception(_is_retryable),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True
+    )
+    async def _open_stream(self, enhanced_prompt: str) -> Tuple[AsyncIterator[str], str]:
+        """Start a stream and wait for its first chunk, retrying transient failures.
+        
+        Only the wait for the first chunk is retried: once text has reached the
+        caller, a failed stream cannot be replayed transparently.
+        """
+        chunks = self._stream_content(enhanced_prompt)
+        try:
+            return chunks, await anext(chunks)
+        except StopAsyncIteration:
+            return chunks, ""
+        except BaseException:
+            await chunks.aclose()
+            raise
+    
+    async def _stream_content(self, enhanced_prompt: str) -> AsyncIterator[str]:
+        """Call the Gemini streamGenerateContent SSE endpoint and yield text chunks"""
+        self._check_circuit()
+        api_key, limiter = self._select_key()
+        await limiter.acquire()
+        
+        try:
+            async with self.client.stream(
+                "POST",
+                f"/models/{self.model_name}:streamGenerateContent",
+                params={"alt": "sse"},
+                json=self._build_payload(enhanced_prompt),
+                headers={"x-goog-api-key": api_key}
+            ) as response:
+                response.raise_for_status()
+                self._consecutive_failures = 0
                 
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    self.logger.error(f"All {self.max_retries} attempts failed")
-                    raise Exception(f"Failed to generate response after {self.max_retries} attempts: {str(e)}")
-    
-    def _add_system_context(self, prompt: str) -> str:
-        """Add system context to the prompt"""
-        system_context = """
-        You are DSA-COACH AI, an intelligent coding mentor specializing in Data Structures and Algorithms. Your role is to help students master DSA concepts through guided practice, avoiding solution dependency.
-
-        Core principles:
-        - Focus on understanding over memorization
-        - Provide progressive hints without revealing complete solutions
-        - Encourage independent thinking through guided questions
-        - Be patient, encouraging, and adapt to the user's level
-        - Connect new problems to previously learned concepts
-        - Build intuition through analogies and examples
-
-        Always maintain a supportive and educational tone. Guide users to discover solutions independently while building lasting DSA intuition.
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    
+                    text = self._extract_text(json.loads(line[5:]))
+                    if text:
+                        yield text
+        except Exception as e:
+            self._record_failure(e)
+            raise
+    
+    def _get_cached_response(self, key: str) -> Optional[str]:
+        """Return a cached response for the prompt key if it has not expired"""
+        entry = self._response_cache.get(key)
+        if entry is None:
+            return None
+        
+        if entry[0] <= time.monotonic():
+            del self._response_cache[key]
+            return None
+        
+        self._response_cache.move_to_end(key)
+        return entry[1]
+    
+    def _cache_response(self, key: str, text: str):
+        """Store a response, evicting the least recently used entries"""
+        self._response_cache[key] = (time.monotonic() + RESPONSE_CACHE_TTL, text)
+        self._response_cache.move_to_end(key)
+        while len(self._response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+            self._response_cache.popitem(last=False)
+    
+    async def generate_response_async(self, prompt: str, context: Optional[Dict[str, Any]] = None,
+                                      use_cache: bool = False,
+                                      response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Generate response from Gemini model without blocking the event loop.
+        
+        Pass response_schema to get JSON output constrained to that schema.
         """
+        if not self.client:
+            raise Exception("Gemini client not initialized. Please check your API key.")
+        
+        enhanced_prompt = self._enhance_prompt_with_context(prompt, context or {})
+        
+        if not use_cache:
+            return await self._generate_with_retries(enhanced_prompt, response_schema)
+        
+        key_source = enhanced_prompt
+        if response_schema is not None:
+            key_source += json.dumps(response_schema, sort_keys=True)
+        cache_key = "gem:" + blake2b(key_source.encode(), digest_size=16).hexdigest()
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_and_cache(cache_key, enhanced_prompt, response_schema))
+            self._inflight[cache_key] = task
+        
+        # Shield so one caller disconnecting does not cancel the call for the others
+        return await asyncio.shield(task)
+    
+    async def generate_responses_async(self, prompts: List[str], context: Optional[Dict[str, Any]] = None,
+                                       use_cache: bool = False) -> List[str]:
+        """Generate responses for independent prompts concurrently, in prompt order"""
+        return await asyncio.gather(
+            *(self.generate_response_async(prompt, context, use_cache) for prompt in prompts)
+        )
+    
+    async def _generate_and_cache(self, cache_key: str, enhanced_prompt: str,
+                                  response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Generate a response for a shared in-flight request and cache it"""
+        try:
+            text = await self._generate_with_retries(enhanced_prompt, response_schema)
+            self._cache_response(cache_key, text)
+            return text
+        finally:
+            self._inflight.pop(cache_key, None)
+    
+    @retry(
+        stop=stop_after_attempt(MAX_RETRIES),
+        wait=wait_exponential_jitter(initial=RETRY_DELAY, max=RETRY_MAX_DELAY),
+        retry=retry_if_exception(_is_retryable),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True
+    )
+    async def _generate_with_retries(self, enhanced_prompt: str,
+                                     response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Call Gemini, retrying transient failures with exponential backoff"""
+        text = await self._generate_content(enhanced_prompt, response_schema)
+        
+        if not text:
+            raise Exception("Empty response from Gemini")
         
-        return f"{system_context}\n\nUser Request: {prompt}"
+        return text.strip()
     
     def _enhance_prompt_with_context(self, prompt: str, context: Dict[str, Any]) -> str:
         """Enhance prompt with conversation context"""
-        enhanced_prompt = self._add_system_context(prompt)
+        # Collect fragments and join once rather than growing a string with +=
+        parts = ["User Request: ", prompt]
         
         if context.get('conversation_history'):
-            history = context['conversation_history'][-3:]  # Last 3 exchanges
-            history_text = "\n".join([f"Previous: {item}" for item in history])
-            enhanced_prompt += f"\n\nConversation History:\n{history_text}"
+            parts.append("\n\nConversation History:")
+            for item in context['conversation_history'][-3:]:  # Last 3 exchanges
+                parts.append(f"\nPrevious: {item}")
         
         if context.get('user_profile'):
             profile = context['user_profile']
-            enhanced_prompt += f"\n\nUser Profile: Skill Level: {profile.get('skill_level', 'Unknown')}, Goal: {profile.get('target_goal', 'Unknown')}"
+            parts.append(
+                f"\n\nUser Profile: Skill Level: {profile.get('skill_level', 'Unknown')}, "
+                f"Goal: {profile.get('target_goal', 'Unknown')}"
+            )
         
         if context.get('current_problem'):
             problem = context['current_problem']
-            enhanced_prompt += f"\n\nCurrent Problem Context: {problem.get('title', 'N/A')} - {problem.get('difficulty', 'Unknown')} difficulty"
+            parts.append(
+                f"\n\nCurrent Problem Context: {problem.get('title', 'N/A')} - "
+                f"{problem.get('difficulty', 'Unknown')} difficulty"
+            )
         
-        return enhanced_prompt
+        return "".join(parts)
     
-    def test_connection(self) -> bool:
+    async def test_connection(self) -> bool:
         """Test if the Gemini API connection is working"""
         try:
-            if not self.model:
+            if not self.client:
+                return False
+            
+            # Status checks poll frequently; trust a recent pass instead of paying for a call
+            if self._last_ok_at is not None and time.monotonic() - self._last_ok_at < GEMINI_CONNECTION_CHECK_TTL:
+                return True
+            
+            test_response = await self._generate_content("Hello, this is a test. Please respond with 'Test successful.'")
+            if 'test successful' not in test_response.lower():
                 return False
             
-            test_response = self.model.generate_content("Hello, this is a test. Please respond with 'Test successful.'")
-            return test_response and hasattr(test_response, 'text') and 'test successful' in test_response.text.lower()
+            self._last_ok_at = time.monotonic()
+            return True
         
         except Exception as e:
-            self.logger.error(f"Connection test failed: {str(e)}")
+            self.logger.error("Connection test failed: %s", e)
             return False
     
     def update_api_key(self, new_api_key: str):
-        """Update the API key and reinitialize the client"""
+        """Replace the configured API keys with a single new key"""
         self.api_key = new_api_key
+        self.api_keys = [new_api_key]
         os.environ["GEMINI_API_KEY"] = new_api_key
-        self._initialize_client()
+        self._last_ok_at = None
+        self._model_info = None
+        if not self.client:
+            self._initialize_client()
+        else:
+            self._key_limiters = [(new_api_key, AsyncLimiter(GEMINI_KEY_RPM, 60))]
+            self._next_key = 0
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the current model"""
-        return {
-            "model_name": self.model_name,
-            "api_key_configured": bool(self.api_key),
-            "client_initialized": bool(self.model),
-            "max_retries": self.max_retries,
-            "retry_delay": self.retry_delay
-        }
+        if self._model_info is None or self._model_info["client_initialized"] != bool(self.client):
+            self._model_info = {
+                "model_name": self.model_name,
+                "api_key_configured": bool(self.api_key),
+                "api_keys_count": len(self._key_limiters),
+                "client_initialized": bool(self.client),
+                "max_retries": self.max_retries,
+                "retry_delay": self.retry_delay
+            }
+        return self._model_info
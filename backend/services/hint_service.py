@@ -1,16 +1,116 @@
+import time
+import asyncio
 import logging
-from typing import Optional
+from collections import OrderedDict
+from hashlib import blake2b
+from types import MappingProxyType
+from typing import Optional, Tuple, Dict, Any, AsyncIterator
 from datetime import datetime
 from shared.models import HintRequest, HintResponse, Hint, Problem
 from backend.services.gemini_service import GeminiService
+from shared.config import HINT_CACHE_TTL, HINT_CACHE_MAX_ENTRIES, HINT_REQUEST_TIMEOUT
+
+# Per-level hint instructions, indexed by hint level - 1
+_HINT_LEVEL_INSTRUCTIONS = (
+    """As DSA-COACH AI, provide a Level 1 hint for the problem below.
+
+Provide Level 1 hint - CLARIFYING QUESTIONS:
+- Ask 2-3 thought-provoking questions to help understand the problem better
+- Guide them to identify key constraints and requirements
+- Help them think about edge cases
+- Don't reveal the algorithm or approach yet
+
+Focus on problem comprehension, not solution approach.
+""",
+    """As DSA-COACH AI, provide a Level 2 hint for the problem below.
+
+Provide Level 2 hint - ALGORITHM DIRECTION:
+- Suggest the general algorithmic approach (e.g., "Consider using two pointers")
+- Mention the data structure family that might be helpful
+- Explain WHY this approach fits the problem
+- Don't give implementation details yet
+
+Guide them toward the right algorithmic thinking.
+""",
+    """As DSA-COACH AI, provide a Level 3 hint for the problem below.
+
+Provide Level 3 hint - SOLUTION STRUCTURE:
+- Outline the high-level steps of the solution
+- Explain the overall structure and flow
+- Mention key variables or data structures needed
+- Still avoid specific code implementation
+
+Help them see the solution framework.
+""",
+    """As DSA-COACH AI, provide a Level 4 hint for the problem below.
+
+Provide Level 4 hint - IMPLEMENTATION HELP:
+- Give specific implementation guidance
+- Show pseudocode or key code snippets if needed
+- Address common implementation pitfalls
+- Help with the trickiest parts of coding
+
+Provide concrete implementation assistance while encouraging independent coding.
+""",
+)
+
+_PERSONALIZED_HINT_INSTRUCTIONS = """As DSA-COACH AI, analyze the user's current approach to the problem below and provide personalized guidance.
+
+Please:
+1. Evaluate their approach - is it on the right track?
+2. If correct direction: Encourage and give next steps
+3. If incorrect: Gently redirect without discouraging
+4. Provide specific, actionable guidance based on their thinking
+5. Ask follow-up questions to guide their thought process
+
+Be supportive and build on their existing understanding.
+"""
+
+_STUCK_HELP_INSTRUCTIONS = """As DSA-COACH AI, the user is completely stuck on the problem below. Provide emergency guidance.
+
+The user needs immediate help to get unstuck. Please:
+1. Reassure them that being stuck is normal and part of learning
+2. Suggest a simpler version of the problem to start with
+3. Provide a concrete first step they can take
+4. Offer an analogy or real-world example to build intuition
+5. Suggest breaking the problem into smaller pieces
+
+Focus on getting them moving again with confidence.
+"""
+
+_HINT_TYPES = MappingProxyType({
+    1: "clarifying",
+    2: "direction",
+    3: "structure",
+    4: "implementation"
+})
+
+# Canned hints by level (0 = personalized, -1 = stuck help) for when generation fails
+_FALLBACK_HINTS = MappingProxyType({
+    1: "Let's start by understanding the problem better. What are the inputs and expected outputs? What constraints should we consider?",
+    2: "Think about what data structures or algorithms might be helpful here. Consider the time complexity requirements.",
+    3: "Try breaking the problem into smaller steps. What would be the main phases of your solution?",
+    4: "Focus on implementing one part at a time. Start with the basic logic and handle edge cases later.",
+    0: "Based on your approach, you're thinking in the right direction. What specific part would you like to explore further?",
+    -1: "It's okay to feel stuck! Try starting with a simpler version of this problem. What would be the most basic case you could solve?"
+})
 
 class HintService:
     def __init__(self, gemini_service: GeminiService):
         self.gemini_service = gemini_service
         self.logger = logging.getLogger(__name__)
         self.max_hint_levels = 4
+        # Deadline for one hint, covering GeminiService's own retries; on expiry
+        # callers get the fallback hint instead of waiting out a slow tail request
+        self.request_timeout = HINT_REQUEST_TIMEOUT
+        
+        # LRU of hint key -> (expires_at, hint text), shared across users. Only
+        # touched from the event loop, so no lock is needed.
+        self._hint_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Hint generations in flight, so concurrent requests with the same key share one call
+        self._inflight_hints: Dict[str, "asyncio.Task[str]"] = {}
     
-    def get_hint(self, request: HintRequest, problem: Problem, user_context: Optional[dict] = None) -> HintResponse:
+    async def get_hint(self, request: HintRequest, problem: Problem, user_context: Optional[dict] = None) -> HintResponse:
         """Get the next level hint for a problem"""
         try:
             next_level = request.current_hint_level + 1
@@ -19,7 +119,8 @@ class HintService:
                 raise ValueError("Maximum hint level reached")
             
             prompt = self._create_hint_prompt(problem, next_level, request.user_approach)
-            hint_content = self.gemini_service.generate_response(prompt, user_context)
+            cache_key = self._hint_cache_key("level", problem, next_level, request.user_approach, user_context)
+            hint_content = await self._cached_generate(cache_key, prompt, user_context)
             
             hint = Hint(
                 level=next_level,
@@ -39,11 +140,62 @@ class HintService:
             # Return fallback hint
             return self._get_fallback_hint(request.current_hint_level + 1)
     
-    def get_personalized_hint(self, user_approach: str, problem: Problem, user_context: Optional[dict] = None) -> HintResponse:
+    async def stream_hint(self, request: HintRequest, problem: Problem,
+                          user_context: Optional[dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream the next level hint as (event, data) pairs.
+        
+        Yields ("chunk", text) as model output arrives and finally ("hint", HintResponse).
+        A cached or already in-flight hint is sent as a single chunk.
+        """
+        next_level = request.current_hint_level + 1
+        
+        try:
+            if next_level > self.max_hint_levels:
+                raise ValueError("Maximum hint level reached")
+            
+            cache_key = self._hint_cache_key("level", problem, next_level, request.user_approach, user_context)
+            hint_content = self._get_cached_hint(cache_key)
+            if hint_content is None and cache_key in self._inflight_hints:
+                hint_content = await asyncio.shield(self._inflight_hints[cache_key])
+            
+            if hint_content is not None:
+                yield "chunk", hint_content
+            else:
+                prompt = self._create_hint_prompt(problem, next_level, request.user_approach)
+                parts = []
+                async for text in self.gemini_service.stream_response_async(prompt, user_context):
+                    parts.append(text)
+                    yield "chunk", text
+                hint_content = "".join(parts)
+                # Reached only when the stream finished; like the buffered path,
+                # an empty reply is an error so a blank hint is never cached
+                if not hint_content.strip():
+                    raise ValueError("Empty hint response from Gemini")
+                self._cache_hint(cache_key, hint_content)
+            
+            hint_response = HintResponse(
+                hint=Hint(
+                    level=next_level,
+                    content=hint_content,
+                    hint_type=self._get_hint_type(next_level),
+                    timestamp=datetime.now()
+                ),
+                next_available=next_level < self.max_hint_levels,
+                total_levels=self.max_hint_levels
+            )
+        
+        except Exception as e:
+            self.logger.error(f"Error streaming hint: {str(e)}")
+            hint_response = self._get_fallback_hint(next_level)
+        
+        yield "hint", hint_response
+    
+    async def get_personalized_hint(self, user_approach: str, problem: Problem, user_context: Optional[dict] = None) -> HintResponse:
         """Get a personalized hint based on user's current approach"""
         try:
             prompt = self._create_personalized_hint_prompt(problem, user_approach)
-            hint_content = self.gemini_service.generate_response(prompt, user_context)
+            cache_key = self._hint_cache_key("personalized", problem, 0, user_approach, user_context)
+            hint_content = await self._cached_generate(cache_key, prompt, user_context)
             
             hint = Hint(
                 level=0,  # Personalized hints are level 0
@@ -62,11 +214,12 @@ class HintService:
             self.logger.error(f"Error generating personalized hint: {str(e)}")
             return self._get_fallback_hint(0, hint_type="personalized")
     
-    def get_stuck_help(self, problem: Problem, user_context: Optional[dict] = None) -> HintResponse:
+    async def get_stuck_help(self, problem: Problem, user_context: Optional[dict] = None) -> HintResponse:
         """Provide emergency guidance when user is completely stuck"""
         try:
             prompt = self._create_stuck_help_prompt(problem)
-            hint_content = self.gemini_service.generate_response(prompt, user_context)
+            cache_key = self._hint_cache_key("stuck", problem, -1, None, user_context)
+            hint_content = await self._cached_generate(cache_key, prompt, user_context)
             
             hint = Hint(
                 level=-1,  # Special level for stuck help
@@ -85,126 +238,93 @@ class HintService:
             self.logger.error(f"Error generating stuck help: {str(e)}")
             return self._get_fallback_hint(-1, hint_type="emergency")
     
-    def _create_hint_prompt(self, problem: Problem, hint_level: int, user_approach: Optional[str]) -> str:
-        """Create appropriate prompt for each hint level"""
-        problem_statement = problem.statement
-        user_approach_text = f"\nUser's current approach: {user_approach}" if user_approach else ""
+    def _hint_cache_key(self, kind: str, problem: Problem, level: int, user_approach: Optional[str],
+                        user_context: Optional[dict]) -> str:
+        """Key a hint by what shapes it: problem, level, approach and the profile fields in the prompt.
         
-        base_prompt = f"""
-        As DSA-COACH AI, provide a Level {hint_level} hint for this problem:
-        
-        Problem: {problem_statement}
-        {user_approach_text}
+        The approach is usually the user's code, where case and indentation matter,
+        so only line endings and trailing whitespace are normalized.
         """
+        approach = '\n'.join(line.rstrip() for line in (user_approach or '').splitlines()).rstrip()
+        profile = (user_context or {}).get('user_profile') or {}
+        raw = "|".join((
+            kind, problem.statement, str(level), approach,
+            str(profile.get('skill_level', '')), str(profile.get('target_goal', ''))
+        ))
+        return blake2b(raw.encode(), digest_size=16).hexdigest()
+    
+    async def _cached_generate(self, cache_key: str, prompt: str, user_context: Optional[dict]) -> str:
+        """Generate hint text, reusing a cached hint for the same key"""
+        cached = self._get_cached_hint(cache_key)
+        if cached is not None:
+            return cached
         
-        if hint_level == 1:
-            return base_prompt + """
-            
-            Provide Level 1 hint - CLARIFYING QUESTIONS:
-            - Ask 2-3 thought-provoking questions to help understand the problem better
-            - Guide them to identify key constraints and requirements
-            - Help them think about edge cases
-            - Don't reveal the algorithm or approach yet
-            
-            Focus on problem comprehension, not solution approach.
-            """
+        task = self._inflight_hints.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_and_cache(cache_key, prompt, user_context))
+            self._inflight_hints[cache_key] = task
         
-        elif hint_level == 2:
-            return base_prompt + """
-            
-            Provide Level 2 hint - ALGORITHM DIRECTION:
-            - Suggest the general algorithmic approach (e.g., "Consider using two pointers")
-            - Mention the data structure family that might be helpful
-            - Explain WHY this approach fits the problem
-            - Don't give implementation details yet
-            
-            Guide them toward the right algorithmic thinking.
-            """
-        
-        elif hint_level == 3:
-            return base_prompt + """
-            
-            Provide Level 3 hint - SOLUTION STRUCTURE:
-            - Outline the high-level steps of the solution
-            - Explain the overall structure and flow
-            - Mention key variables or data structures needed
-            - Still avoid specific code implementation
-            
-            Help them see the solution framework.
-            """
+        # Shield so one caller disconnecting does not cancel the call for the others
+        return await asyncio.shield(task)
+    
+    async def _generate_and_cache(self, cache_key: str, prompt: str, user_context: Optional[dict]) -> str:
+        """Generate a hint for every waiter on this key and cache it"""
+        try:
+            hint_content = await asyncio.wait_for(
+                self.gemini_service.generate_response_async(prompt, user_context, use_cache=True),
+                timeout=self.request_timeout
+            )
+            self._cache_hint(cache_key, hint_content)
+            return hint_content
+        finally:
+            self._inflight_hints.pop(cache_key, None)
+    
+    def _get_cached_hint(self, cache_key: str) -> Optional[str]:
+        """Return the cached hint for a key, or None if absent or expired"""
+        entry = self._hint_cache.get(cache_key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._hint_cache[cache_key]
+            return None
+        self._hint_cache.move_to_end(cache_key)
+        return entry[1]
+    
+    def _cache_hint(self, cache_key: str, hint_content: str):
+        """Store a generated hint, evicting the least recently used entries"""
+        self._hint_cache[cache_key] = (time.monotonic() + HINT_CACHE_TTL, hint_content)
+        self._hint_cache.move_to_end(cache_key)
+        while len(self._hint_cache) > HINT_CACHE_MAX_ENTRIES:
+            self._hint_cache.popitem(last=False)
+    
+    def _create_hint_prompt(self, problem: Problem, hint_level: int, user_approach: Optional[str]) -> str:
+        """Create appropriate prompt for each hint level"""
+        user_approach_text = f"\nUser's current approach: {user_approach}" if user_approach else ""
         
-        elif hint_level == 4:
-            return base_prompt + """
-            
-            Provide Level 4 hint - IMPLEMENTATION HELP:
-            - Give specific implementation guidance
-            - Show pseudocode or key code snippets if needed
-            - Address common implementation pitfalls
-            - Help with the trickiest parts of coding
-            
-            Provide concrete implementation assistance while encouraging independent coding.
-            """
+        # Static instructions first and problem-specific text last, so requests
+        # for the same level share the longest possible prompt prefix
+        if 1 <= hint_level <= len(_HINT_LEVEL_INSTRUCTIONS):
+            instructions = _HINT_LEVEL_INSTRUCTIONS[hint_level - 1]
+        else:
+            instructions = f"As DSA-COACH AI, provide a Level {hint_level} hint for this problem.\n"
         
-        return base_prompt
+        return f"{instructions}\nProblem: {problem.statement}{user_approach_text}\n"
     
     def _create_personalized_hint_prompt(self, problem: Problem, user_approach: str) -> str:
         """Create prompt for personalized hint based on user's approach"""
-        return f"""
-        As DSA-COACH AI, analyze the user's current approach and provide personalized guidance:
-        
-        Problem: {problem.statement}
-        
-        User's Current Approach: {user_approach}
-        
-        Please:
-        1. Evaluate their approach - is it on the right track?
-        2. If correct direction: Encourage and give next steps
-        3. If incorrect: Gently redirect without discouraging
-        4. Provide specific, actionable guidance based on their thinking
-        5. Ask follow-up questions to guide their thought process
-        
-        Be supportive and build on their existing understanding.
-        """
+        return f"{_PERSONALIZED_HINT_INSTRUCTIONS}\nProblem: {problem.statement}\n\nUser's Current Approach: {user_approach}\n"
     
     def _create_stuck_help_prompt(self, problem: Problem) -> str:
         """Create prompt for emergency stuck help"""
-        return f"""
-        As DSA-COACH AI, the user is completely stuck on this problem. Provide emergency guidance:
-        
-        Problem: {problem.statement}
-        
-        The user needs immediate help to get unstuck. Please:
-        1. Reassure them that being stuck is normal and part of learning
-        2. Suggest a simpler version of the problem to start with
-        3. Provide a concrete first step they can take
-        4. Offer an analogy or real-world example to build intuition
-        5. Suggest breaking the problem into smaller pieces
-        
-        Focus on getting them moving again with confidence.
-        """
+        return f"{_STUCK_HELP_INSTRUCTIONS}\nProblem: {problem.statement}\n"
     
     def _get_hint_type(self, level: int) -> str:
         """Get hint type based on level"""
-        hint_types = {
-            1: "clarifying",
-            2: "direction",
-            3: "structure",
-            4: "implementation"
-        }
-        return hint_types.get(level, "general")
+        return _HINT_TYPES.get(level, "general")
     
     def _get_fallback_hint(self, level: int, hint_type: Optional[str] = None) -> HintResponse:
         """Provide fallback hint when AI generation fails"""
-        fallback_hints = {
-            1: "Let's start by understanding the problem better. What are the inputs and expected outputs? What constraints should we consider?",
-            2: "Think about what data structures or algorithms might be helpful here. Consider the time complexity requirements.",
-            3: "Try breaking the problem into smaller steps. What would be the main phases of your solution?",
-            4: "Focus on implementing one part at a time. Start with the basic logic and handle edge cases later.",
-            0: "Based on your approach, you're thinking in the right direction. What specific part would you like to explore further?",
-            -1: "It's okay to feel stuck! Try starting with a simpler version of this problem. What would be the most basic case you could solve?"
-        }
-        
-        content = fallback_hints.get(level, "Keep thinking through the problem step by step. You're making progress!")
+        content = _FALLBACK_HINTS.get(level, "Keep thinking through the problem step by step. You're making progress!")
         
         hint = Hint(
             level=level,
@@ -1,24 +1,160 @@
+import re
+import random
+import asyncio
 import logging
+import orjson
 from typing import List, Dict, Any
 from shared.models import Problem, ProblemGenerationRequest, DifficultyLevel
 from backend.services.gemini_service import GeminiService
+from shared.config import PROBLEM_GENERATION_CONCURRENCY, PROBLEM_VARIATION_TIMEOUT
+
+# Static part of the variation prompt, identical across requests and variations.
+# It leads the prompt so Gemini's implicit prefix caching can reuse it; it is far
+# below the minimum size for an explicit cachedContents entry.
+_GENERATION_PROMPT_HEAD = """As DSA-COACH AI, analyze the coding problem below and generate ONE similar problem variation.
+
+Requirements:
+1. Practice the same core algorithmic concept as the original
+2. Use the same core algorithmic pattern but a different context
+3. Include a clear problem title
+4. Include a complete problem statement with examples and appropriate constraints
+5. Include an estimated solve time and the expected time/space complexity
+
+Provide:
+- Title: Brief descriptive title
+- Difficulty: Easy/Medium/Hard
+- Core Concept: Main algorithmic concept being practiced
+- Statement: Complete problem description with examples and constraints
+- Context: How it differs from the original
+- Estimated Time: Expected solve time (e.g., "15-20 min")
+- Complexity: Expected time complexity (e.g., "O(n)")
+- Approach Hint: High-level approach (only if requested)
+
+Respond with a JSON object with the keys title, difficulty, core_concept, statement,
+context, estimated_time, complexity and approach_hint.
+"""
+
+# Gemini response schema for one generated problem (OpenAPI subset)
+_PROBLEM_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": {"type": "STRING"},
+        "difficulty": {"type": "STRING", "enum": [level.value for level in DifficultyLevel]},
+        "core_concept": {"type": "STRING"},
+        "statement": {"type": "STRING"},
+        "context": {"type": "STRING"},
+        "estimated_time": {"type": "STRING"},
+        "complexity": {"type": "STRING"},
+        "approach_hint": {"type": "STRING", "nullable": True},
+    },
+    "required": ["title", "difficulty", "core_concept", "statement", "context",
+                 "estimated_time", "complexity"],
+}
+
+# A labelled field line such as "- Title: Two Sum" or "**Estimated Time:** 15 min"
+_FIELD_RE = re.compile(
+    r'^[ \t]*[-*#]*[ \t]*\**'
+    r'(title|difficulty|statement|description|core concept|concept|context|'
+    r'estimated time|time|complexity|approach hint|hint)'
+    r'\**[ \t]*:[ \t]*\**[ \t]*(.*)$',
+    re.IGNORECASE | re.MULTILINE
+)
+# A "Problem 2:" / "**Variation 1.**" header line starting a problem in the response
+_HEADER_RE = re.compile(r'^[ \t]*[-*#]*[ \t]*\**(?:problem|variation)[ \t]*\d+\b', re.IGNORECASE | re.MULTILINE)
+# Field label (lowercased) -> Problem attribute
+_FIELD_MAP = {
+    "title": "title",
+    "difficulty": "difficulty",
+    "statement": "statement",
+    "description": "statement",
+    "core concept": "core_concept",
+    "concept": "core_concept",
+    "context": "context",
+    "estimated time": "estimated_time",
+    "time": "estimated_time",
+    "complexity": "complexity",
+    "approach hint": "approach_hint",
+    "hint": "approach_hint",
+}
+
+# Used when generation fails entirely; difficulty and hints follow the request
+_FALLBACK_PROBLEMS = (
+    {
+        "title": "Array Sum Variation",
+        "statement": "Find the maximum sum of any contiguous subarray in the given array.",
+        "core_concept": "Dynamic Programming",
+        "context": "Classic subarray problem"
+    },
+    {
+        "title": "Tree Traversal Challenge",
+        "statement": "Implement an iterative in-order traversal of a binary tree.",
+        "core_concept": "Tree Traversal",
+        "context": "Iterative approach"
+    },
+    {
+        "title": "Hash Table Lookup",
+        "statement": "Find two numbers in an array that add up to a target sum.",
+        "core_concept": "Hash Tables",
+        "context": "Two-sum variation"
+    },
+)
+
+# Practice problems served by get_random_problem, built once at import time
+_RANDOM_PROBLEMS = tuple(
+    Problem(
+        title=title,
+        statement=statement,
+        difficulty=DifficultyLevel.MEDIUM,
+        core_concept=core_concept,
+        context=context,
+        estimated_time="20-25 min",
+        complexity="O(n)",
+        approach_hint="Consider the most efficient approach for this problem pattern."
+    )
+    for title, statement, core_concept, context in (
+        ("Maximum Subarray Sum",
+         "Given an array of integers, find the maximum sum of a contiguous subarray.",
+         "Dynamic Programming", "Kadane's Algorithm variation"),
+        ("Binary Tree Balance Check",
+         "Implement a function to check if a binary tree is balanced.",
+         "Tree Algorithms", "Tree property verification"),
+        ("Longest Substring Without Repeating Characters",
+         "Find the length of the longest substring without repeating characters.",
+         "Sliding Window", "String processing with hash set"),
+        ("Linked List Cycle Detection",
+         "Determine if a linked list has a cycle using Floyd's algorithm.",
+         "Two Pointers", "Fast and slow pointer technique"),
+    )
+)
 
 class ProblemGeneratorService:
     def __init__(self, gemini_service: GeminiService):
         self.gemini_service = gemini_service
         self.logger = logging.getLogger(__name__)
     
-    def generate_problems(self, request: ProblemGenerationRequest) -> List[Problem]:
+    async def generate_problems(self, request: ProblemGenerationRequest) -> List[Problem]:
         """Generate problem variations based on the request"""
         try:
-            prompt = self._create_generation_prompt(request)
-            response = self.gemini_service.generate_response(prompt)
+            # One prompt per variation, generated concurrently: latency follows the
+            # slowest variation, and one bad response no longer loses the others
+            semaphore = asyncio.Semaphore(PROBLEM_GENERATION_CONCURRENCY)
+            results = await asyncio.gather(
+                *(self._generate_variation(request, index, semaphore)
+                  for index in range(1, request.num_variations + 1)),
+                return_exceptions=True
+            )
             
-            problems = self._parse_generated_problems(response)
+            problems = [result for result in results if not isinstance(result, Exception)]
+            if len(problems) < len(results):
+                failures = {
+                    index: str(result) for index, result in enumerate(results, 1)
+                    if isinstance(result, Exception)
+                }
+                self.logger.warning("Failed to generate variations: %s", failures)
             
             if not problems:
                 # Fallback with simpler approach
-                self.logger.warning("Failed to parse AI response, using fallback")
+                self.logger.warning("No variations generated, using fallback")
                 problems = self._generate_fallback_problems(request)
             
             return problems
@@ -27,211 +163,127 @@ class ProblemGeneratorService:
             self.logger.error(f"Error generating problems: {str(e)}")
             return self._generate_fallback_problems(request)
     
-    def _create_generation_prompt(self, request: ProblemGenerationRequest) -> str:
-        """Create a detailed prompt for problem generation"""
-        focus_text = ""
-        if request.focus_areas:
-            focus_text = f"Focus specifically on: {', '.join(request.focus_areas)}"
+    async def _generate_variation(self, request: ProblemGenerationRequest, index: int,
+                                  semaphore: asyncio.Semaphore) -> Problem:
+        """Generate and parse a single problem variation"""
+        prompt = self._create_generation_prompt(request, index)
+        async with semaphore:
+            response = await asyncio.wait_for(
+                self.gemini_service.generate_response_async(prompt, response_schema=_PROBLEM_SCHEMA),
+                timeout=PROBLEM_VARIATION_TIMEOUT
+            )
+        return self._parse_problem_response(response, index)
+    
+    def _parse_problem_response(self, response: str, problem_num: int) -> Problem:
+        """Parse a variation returned as schema JSON, falling back to labelled text"""
+        try:
+            fields = orjson.loads(response)
+        except orjson.JSONDecodeError:
+            fields = None
         
-        hint_instruction = "Include a high-level approach hint for each variation." if request.include_hints else "Do not include solution hints."
+        if isinstance(fields, dict):
+            return self._build_problem(
+                {key: str(value).strip() for key, value in fields.items() if value},
+                problem_num
+            )
         
-        prompt = f"""
-        As DSA-COACH AI, analyze the following coding problem and generate {request.num_variations} similar problem variations.
-
-        Original Problem:
-        {request.original_problem}
-
-        Requirements:
-        1. Generate {request.num_variations} variations that practice the same core algorithmic concept
-        2. Difficulty level: {request.difficulty_level.value}
-        3. Include these context variations: {', '.join(request.context_options)}
-        4. {focus_text}
-        5. {hint_instruction}
-        6. Each variation should have:
-           - A clear problem title
-           - Complete problem statement with examples
-           - Same core algorithmic pattern but different context
-           - Appropriate constraints
-           - Estimated solve time
-           - Expected time/space complexity
-
-        For each variation, provide:
-        - Title: Brief descriptive title
-        - Difficulty: Easy/Medium/Hard
-        - Core Concept: Main algorithmic concept being practiced
-        - Statement: Complete problem description with examples and constraints
-        - Context: How it differs from the original
-        - Estimated Time: Expected solve time (e.g., "15-20 min")
-        - Complexity: Expected time complexity (e.g., "O(n)")
-        - Approach Hint: High-level approach (only if requested)
-
-        Format your response as a structured list with clear sections for each problem.
-        Make sure each variation is significantly different but tests the same core concept.
+        self.logger.warning(f"Variation {problem_num} was not JSON, parsing as labelled text")
+        return self._parse_problem_section(self._first_problem_section(response), problem_num)
+    
+    def _first_problem_section(self, response: str) -> str:
+        """Return the text of the first problem when the model numbered its output.
+        
+        Headers are matched only at line starts, so "problem" inside a statement
+        is not a boundary. A response without headers is returned unchanged.
         """
-        return prompt
+        headers = _HEADER_RE.finditer(response)
+        first = next(headers, None)
+        if first is None:
+            return response
+        following = next(headers, None)
+        return response[first.end():following.start() if following else len(response)]
     
-    def _parse_generated_problems(self, response: str) -> List[Problem]:
-        """Parse the AI response into structured problem data"""
-        try:
-            problems = []
-            sections = response.split("Problem")
-            
-            for i, section in enumerate(sections[1:], 1):
-                try:
-                    problem = self._parse_problem_section(section, i)
-                    if problem:
-                        problems.append(problem)
-                except Exception as e:
-                    self.logger.warning(f"Failed to parse problem {i}: {str(e)}")
-                    continue
-            
-            return problems
+    def _create_generation_prompt(self, request: ProblemGenerationRequest, index: int) -> str:
+        """Create the prompt for one variation; the shared head comes first"""
+        focus_text = ""
+        if request.focus_areas:
+            focus_text = f"Focus specifically on: {', '.join(request.focus_areas)}\n"
         
-        except Exception as e:
-            self.logger.error(f"Error parsing problems: {str(e)}")
-            return []
+        # Spread the requested contexts across the variations
+        context_text = ""
+        if request.context_options:
+            context_option = request.context_options[(index - 1) % len(request.context_options)]
+            context_text = f"Context for this variation: {context_option}\n"
+        
+        hint_instruction = "Include a high-level approach hint." if request.include_hints else "Do not include solution hints."
+        
+        return (
+            f"{_GENERATION_PROMPT_HEAD}\n"
+            f"Original Problem:\n{request.original_problem}\n\n"
+            f"This is variation {index} of {request.num_variations}; make it clearly different from the others.\n"
+            f"Difficulty level: {request.difficulty_level.value}\n"
+            f"{context_text}"
+            f"{focus_text}"
+            f"{hint_instruction}\n"
+        )
     
     def _parse_problem_section(self, section: str, problem_num: int) -> Problem:
         """Parse a single problem section"""
-        lines = [line.strip() for line in section.split('\n') if line.strip()]
+        fields: Dict[str, str] = {}
+        matches = list(_FIELD_RE.finditer(section))
         
-        # Initialize with defaults
-        title = f"Generated Problem {problem_num}"
-        statement = ""
-        difficulty = DifficultyLevel.MEDIUM
-        core_concept = "Algorithm Practice"
-        context = "Generated variation"
-        estimated_time = "15-20 min"
-        complexity = "O(n)"
-        approach_hint = None
+        for i, match in enumerate(matches):
+            field = _FIELD_MAP[match.group(1).lower()]
+            if field == 'statement':
+                # The statement runs on until the next labelled field
+                end = matches[i + 1].start() if i + 1 < len(matches) else len(section)
+                value = ' '.join(section[match.start(2):end].split())
+            else:
+                value = match.group(2).strip()
+            if value:
+                fields[field] = value
         
-        current_field = None
-        for line in lines:
-            line_lower = line.lower()
-            
-            if line_lower.startswith(('title:', '- title:')):
-                title = line.split(':', 1)[1].strip()
-                current_field = 'title'
-            elif line_lower.startswith(('difficulty:', '- difficulty:')):
-                diff_text = line.split(':', 1)[1].strip().lower()
-                if 'easy' in diff_text:
-                    difficulty = DifficultyLevel.EASY
-                elif 'hard' in diff_text:
-                    difficulty = DifficultyLevel.HARD
-                else:
-                    difficulty = DifficultyLevel.MEDIUM
-                current_field = 'difficulty'
-            elif line_lower.startswith(('statement:', '- statement:', 'description:')):
-                statement = line.split(':', 1)[1].strip()
-                current_field = 'statement'
-            elif line_lower.startswith(('core concept:', '- core concept:', 'concept:')):
-                core_concept = line.split(':', 1)[1].strip()
-                current_field = 'concept'
-            elif line_lower.startswith(('context:', '- context:')):
-                context = line.split(':', 1)[1].strip()
-                current_field = 'context'
-            elif line_lower.startswith(('estimated time:', '- estimated time:', 'time:')):
-                estimated_time = line.split(':', 1)[1].strip()
-                current_field = 'time'
-            elif line_lower.startswith(('complexity:', '- complexity:')):
-                complexity = line.split(':', 1)[1].strip()
-                current_field = 'complexity'
-            elif line_lower.startswith(('hint:', '- hint:', 'approach hint:')):
-                approach_hint = line.split(':', 1)[1].strip()
-                current_field = 'hint'
-            elif current_field == 'statement' and not line.startswith(('-', 'title:', 'difficulty:')):
-                # Continue statement on next lines
-                statement += " " + line
+        return self._build_problem(fields, problem_num)
+    
+    def _build_problem(self, fields: Dict[str, str], problem_num: int) -> Problem:
+        """Build a Problem from parsed fields, filling defaults for missing ones"""
+        diff_text = fields.get('difficulty', '').lower()
+        if 'easy' in diff_text:
+            difficulty = DifficultyLevel.EASY
+        elif 'hard' in diff_text:
+            difficulty = DifficultyLevel.HARD
+        else:
+            difficulty = DifficultyLevel.MEDIUM
+        
+        core_concept = fields.get('core_concept', "Algorithm Practice")
         
         return Problem(
-            title=title,
-            statement=statement or f"Practice problem {problem_num} focusing on {core_concept}",
+            title=fields.get('title', f"Generated Problem {problem_num}"),
+            statement=fields.get('statement', f"Practice problem {problem_num} focusing on {core_concept}"),
             difficulty=difficulty,
             core_concept=core_concept,
-            context=context,
-            estimated_time=estimated_time,
-            complexity=complexity,
-            approach_hint=approach_hint
+            context=fields.get('context', "Generated variation"),
+            estimated_time=fields.get('estimated_time', "15-20 min"),
+            complexity=fields.get('complexity', "O(n)"),
+            approach_hint=fields.get('approach_hint')
         )
     
     def _generate_fallback_problems(self, request: ProblemGenerationRequest) -> List[Problem]:
         """Generate fallback problems when AI parsing fails"""
-        fallback_problems = [
-            {
-                "title": "Array Sum Variation",
-                "statement": "Find the maximum sum of any contiguous subarray in the given array.",
-                "core_concept": "Dynamic Programming",
-                "context": "Classic subarray problem"
-            },
-            {
-                "title": "Tree Traversal Challenge",
-                "statement": "Implement an iterative in-order traversal of a binary tree.",
-                "core_concept": "Tree Traversal",
-                "context": "Iterative approach"
-            },
-            {
-                "title": "Hash Table Lookup",
-                "statement": "Find two numbers in an array that add up to a target sum.",
-                "core_concept": "Hash Tables",
-                "context": "Two-sum variation"
-            }
-        ]
+        approach_hint = "Think about the most efficient data structure for this problem." if request.include_hints else None
         
-        problems = []
-        for i, prob_data in enumerate(fallback_problems[:request.num_variations]):
-            problem = Problem(
-                title=prob_data["title"],
-                statement=prob_data["statement"],
+        return [
+            Problem(
+                **prob_data,
                 difficulty=request.difficulty_level,
-                core_concept=prob_data["core_concept"],
-                context=prob_data["context"],
                 estimated_time="15-20 min",
                 complexity="O(n)",
-                approach_hint="Think about the most efficient data structure for this problem." if request.include_hints else None
+                approach_hint=approach_hint
             )
-            problems.append(problem)
-        
-        return problems
+            for prob_data in _FALLBACK_PROBLEMS[:request.num_variations]
+        ]
     
     def get_random_problem(self) -> Problem:
         """Generate a random practice problem"""
-        random_problems = [
-            {
-                "title": "Maximum Subarray Sum",
-                "statement": "Given an array of integers, find the maximum sum of a contiguous subarray.",
-                "core_concept": "Dynamic Programming",
-                "context": "Kadane's Algorithm variation"
-            },
-            {
-                "title": "Binary Tree Balance Check",
-                "statement": "Implement a function to check if a binary tree is balanced.",
-                "core_concept": "Tree Algorithms",
-                "context": "Tree property verification"
-            },
-            {
-                "title": "Longest Substring Without Repeating Characters",
-                "statement": "Find the length of the longest substring without repeating characters.",
-                "core_concept": "Sliding Window",
-                "context": "String processing with hash set"
-            },
-            {
-                "title": "Linked List Cycle Detection",
-                "statement": "Determine if a linked list has a cycle using Floyd's algorithm.",
-                "core_concept": "Two Pointers",
-                "context": "Fast and slow pointer technique"
-            }
-        ]
-        
-        import random
-        selected = random.choice(random_problems)
-        
-        return Problem(
-            title=selected["title"],
-            statement=selected["statement"],
-            difficulty=DifficultyLevel.MEDIUM,
-            core_concept=selected["core_concept"],
-            context=selected["context"],
-            estimated_time="20-25 min",
-            complexity="O(n)",
-            approach_hint="Consider the most efficient approach for this problem pattern."
-        )
+        # Copy so callers never share the module-level instance
+        return random.choice(_RANDOM_PROBLEMS).model_copy()
@@ -1,51 +1,413 @@
+import time
+import atexit
+import threading
 import httpx
+import orjson
 import streamlit as st
 import logging
-from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, Future
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception
+from typing import Dict, Any, Optional, List, Callable, Tuple, Iterator
+from pydantic import BaseModel
 from shared.config import API_URL
 from shared.models import (
     UserProfile, ProblemGenerationRequest, HintRequest, 
-    CodeReviewRequest, APIResponse, DifficultyLevel
+    CodeReviewRequest, APIResponse, DifficultyLevel, Problem
 )
 
-import os
-from dotenv import load_dotenv
-load_dotenv()
-os.environ['GOOGLE_API_KEY'] = os.getenv('GOOGLE_API_KEY')
-
 logger = logging.getLogger(__name__)
 
+_DIFFICULTY_VALUES = frozenset(level.value for level in DifficultyLevel)
+
+# GET endpoints whose responses are reused across Streamlit reruns: (path prefix, TTL
+# seconds). Anything not listed, such as the random problem endpoint, is never cached.
+# Failures are never cached, so "Retry Connection" always reaches the backend, and
+# the circuit breaker covers the backend going down within a TTL.
+_GET_CACHE_TTLS = (
+    ("/health", 30.0),
+    ("/api/status", 60.0),
+    ("/api/system/stats", 30.0),
+    ("/api/users/", 30.0),
+)
+_GET_CACHE_MAX_ENTRIES = 256
+
+# Read timeouts by endpoint prefix (seconds), first match wins: quick reads fail fast,
+# Gemini-backed endpoints get room for generation. Others use APIClient.timeout.
+_REQUEST_TIMEOUTS = (
+    ("/health", 2.0),
+    ("/api/status", 10.0),
+    ("/api/system/", 5.0),
+    ("/api/problems/generate", 60.0),
+    ("/api/problems/", 10.0),
+    ("/api/hints/", 30.0),
+    ("/api/code-review", 60.0),
+    ("/api/solutions/", 60.0),
+    ("/api/users/", 5.0),
+)
+_CONNECT_TIMEOUT = 3.0
+
+# Bulkheads: Gemini-backed endpoints share a small pool of concurrent calls so slow
+# generations cannot take every connection from cheap reads like /health. The pools
+# are shared by every session in the process, so a request queues for a slot for up
+# to its own read timeout rather than failing while others finish.
+_LLM_PREFIXES = ("/api/solutions/", "/api/hints/", "/api/code-review", "/api/problems/generate")
+_BULKHEAD_SIZES = {"llm": 4, "meta": 16}
+
+def _read_timeout(endpoint: str, default: float) -> float:
+    """Read timeout for an endpoint, by the first matching prefix"""
+    return next((timeout for prefix, timeout in _REQUEST_TIMEOUTS if endpoint.startswith(prefix)), default)
+
+def _timeout_for(endpoint: str, default: float) -> httpx.Timeout:
+    """Pick the read timeout for an endpoint; connecting never waits longer than a few seconds"""
+    read = _read_timeout(endpoint, default)
+    return httpx.Timeout(read, connect=min(read, _CONNECT_TIMEOUT))
+
+# Statuses worth retrying for idempotent requests; other 4xx are the caller's fault
+_RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+_RETRY_AFTER_MAX = 5.0  # cap on a server-requested wait, the user is watching a spinner
+_backoff = wait_random_exponential(multiplier=0.2, max=2.0)
+
+# Circuit breaker: consecutive transient failures before failing fast, and for how long
+_BREAKER_THRESHOLD = 5
+_BREAKER_COOLDOWN = 30.0
+
+def _hint_problem(problem: Dict[str, Any]) -> Problem:
+    """Build the Problem a hint request carries from a problem held in session state.
+    
+    Session problems come from several pages (generator, interview questions, the
+    hint demo) and use "description" or "statement", dict or string examples.
+    """
+    examples = [
+        example if isinstance(example, str) else
+        f"Input: {example.get('input', '')} Output: {example.get('output', '')}"
+        for example in problem.get('examples') or []
+    ]
+    difficulty = problem.get('difficulty')
+    return Problem(
+        id=problem.get('id'),
+        title=problem.get('title') or "Current Problem",
+        statement=problem.get('statement') or problem.get('description') or "",
+        difficulty=difficulty if difficulty in _DIFFICULTY_VALUES else DifficultyLevel.MEDIUM,
+        core_concept=problem.get('core_concept') or ", ".join(problem.get('topics') or []) or "Algorithm Practice",
+        context=problem.get('context') or "",
+        estimated_time=problem.get('estimated_time') or "",
+        complexity=problem.get('complexity') or "",
+        approach_hint=problem.get('approach_hint'),
+        examples=examples,
+        constraints=[str(constraint) for constraint in problem.get('constraints') or []]
+    )
+
+class BackendUnavailableError(Exception):
+    """Raised without calling the API while the circuit breaker is open"""
+
+@dataclass
+class ApiError:
+    """A failed API call, kept for the page to report once per run"""
+    kind: str  # "unavailable", "busy", "timeout", "connect", "http" or "other"
+    message: str
+    status: Optional[int] = None
+
+def _is_transient(exc: BaseException) -> bool:
+    """Retry timeouts, refused connections and transient statuses"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in _RETRY_STATUSES
+    return isinstance(exc, (httpx.TimeoutException, httpx.ConnectError))
+
+def _retry_wait(retry_state) -> float:
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header"""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), _RETRY_AFTER_MAX)
+    return _backoff(retry_state)
+
 class APIClient:
     def __init__(self, base_url: str = API_URL):
         self.base_url = base_url
         self.timeout = 30.0
+        # One pooled client for the process so requests reuse keep-alive connections.
+        # HTTP/2 is negotiated over TLS (e.g. behind an h2 proxy); plain http:// to
+        # uvicorn stays on HTTP/1.1.
+        self._client = httpx.Client(
+            base_url=base_url,
+            timeout=self.timeout,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=40, keepalive_expiry=30.0)
+        )
+        # Workers for fetch_all; httpx.Client is safe to share across threads
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="api-client")
+        # LRU of (endpoint, params) -> (expires_at, response) for cacheable GETs
+        self._get_cache: "OrderedDict[Tuple[str, tuple], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Cache key -> (ETag, response) for conditional GETs once the TTL entry expires
+        self._etags: Dict[Tuple[str, tuple], Tuple[str, Dict[str, Any]]] = {}
+        # Cacheable GETs in flight, so concurrent identical requests share one call
+        self._inflight: Dict[Tuple[str, tuple], "Future[Optional[Dict[str, Any]]]"] = {}
+        self._get_cache_lock = threading.Lock()
+        # user_id -> (response data, parsed profile), so a cached response is parsed once
+        self._parsed_profiles: Dict[str, Tuple[Dict[str, Any], UserProfile]] = {}
+        # Circuit breaker: consecutive transport/5xx failures, and when calls may resume
+        # (0 while closed). Shared by fetch_all workers, hence the lock.
+        self._consecutive_failures = 0
+        self._breaker_open_until = 0.0
+        self._breaker_lock = threading.Lock()
+        self._bulkheads = {name: threading.BoundedSemaphore(size) for name, size in _BULKHEAD_SIZES.items()}
+    
+    def close(self):
+        """Close pooled connections to the API"""
+        self._executor.shutdown(wait=False)
+        self._client.close()
+    
+    def fetch_all(self, *calls: Callable[[], Any]) -> List[Any]:
+        """Run independent API calls concurrently and return their results in order.
+        
+        Workers inherit the current Streamlit script context so their errors are
+        recorded for the calling session.
+        """
+        ctx = get_script_run_ctx()
+        
+        def run(call: Callable[[], Any]) -> Any:
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return call()
+        
+        return list(self._executor.map(run, calls))
+    
+    def submit(self, call: Callable[..., Any], *args, **kwargs) -> Future:
+        """Run an API call in the background, with the current Streamlit script context"""
+        ctx = get_script_run_ctx()
+        
+        def run() -> Any:
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return call(*args, **kwargs)
+        
+        return self._executor.submit(run)
+    
+    def invalidate(self, prefix: str = ""):
+        """Drop cached GET responses for endpoints starting with prefix"""
+        with self._get_cache_lock:
+            for key in [key for key in self._get_cache if key[0].startswith(prefix)]:
+                del self._get_cache[key]
     
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Optional[Dict[str, Any]]:
-        """Make HTTP request to the API"""
+        """Make HTTP request to the API, serving repeated GETs from a short-lived cache.
+        
+        Pass timeout= to override the per-endpoint default.
+        """
+        kwargs.setdefault("timeout", _timeout_for(endpoint, self.timeout))
+        if "json" in kwargs:
+            # orjson is faster than httpx's stdlib encoding and handles datetimes in model dumps
+            kwargs["content"] = orjson.dumps(kwargs.pop("json"))
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "Content-Type": "application/json"}
+        if method != "GET":
+            result = self._send(method, endpoint, **kwargs)
+            if result is not None:
+                # Writes change user-scoped data (profile, history, progress)
+                self.invalidate("/api/users/")
+            return result
+        
+        ttl = next((ttl for prefix, ttl in _GET_CACHE_TTLS if endpoint.startswith(prefix)), None)
+        if ttl is None:
+            return self._send(method, endpoint, **kwargs)
+        
+        key = (endpoint, tuple(sorted((kwargs.get("params") or {}).items())))
+        with self._get_cache_lock:
+            entry = self._get_cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._get_cache.move_to_end(key)
+                return entry[1]
+            
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not owner:
+            return future.result()
+        
         try:
-            url = f"{self.base_url}{endpoint}"
+            result = self._send(method, endpoint, etag_key=key, **kwargs)
+            with self._get_cache_lock:
+                if result is not None:
+                    self._get_cache[key] = (time.monotonic() + ttl, result)
+                    self._get_cache.move_to_end(key)
+                    while len(self._get_cache) > _GET_CACHE_MAX_ENTRIES:
+                        self._get_cache.popitem(last=False)
+                del self._inflight[key]
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            with self._get_cache_lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+    
+    def _send(self, method: str, endpoint: str, etag_key: Optional[Tuple[str, tuple]] = None,
+              **kwargs) -> Optional[Dict[str, Any]]:
+        """Send one HTTP request to the API, recording failures for render_errors.
+        
+        With etag_key, the request is made conditional on the last ETag seen for
+        that key and a 304 reply returns the stored response without a body.
+        """
+        bulkhead = self._acquire_bulkhead(method, endpoint)
+        if bulkhead is None:
+            return None
+        
+        try:
+            known = self._etags.get(etag_key) if etag_key is not None else None
+            if known is not None:
+                kwargs["headers"] = {**(kwargs.get("headers") or {}), "If-None-Match": known[0]}
             
-            with httpx.Client(timeout=self.timeout) as client:
-                response = client.request(method, url, **kwargs)
-                response.raise_for_status()
-                return response.json()
-                
-        except httpx.TimeoutException:
-            st.error("Request timed out. Please try again.")
-            logger.error(f"Timeout for {method} {endpoint}")
+            # Only GETs are safe to replay; writes are sent exactly once
+            if method == "GET":
+                response = self._request_with_retries(method, endpoint, **kwargs)
+            else:
+                response = self._request(method, endpoint, **kwargs)
+            
+            if response.status_code == 304 and known is not None:
+                return known[1]
+            
+            result = orjson.loads(response.content)
+            etag = response.headers.get("ETag")
+            if etag_key is not None and etag:
+                with self._get_cache_lock:
+                    self._etags[etag_key] = (etag, result)
+                    if len(self._etags) > _GET_CACHE_MAX_ENTRIES:
+                        del self._etags[next(iter(self._etags))]
+            return result
+            
+        except Exception as e:
+            self._record_request_error(method, endpoint, e)
             return None
-        except httpx.ConnectError:
-            st.error("Cannot connect to the backend service. Please ensure the API server is running.")
+        finally:
+            bulkhead.release()
+    
+    def _acquire_bulkhead(self, method: str, endpoint: str) -> Optional[threading.BoundedSemaphore]:
+        """Take a slot in the endpoint's bulkhead, waiting up to its read timeout.
+        
+        Returns the semaphore to release, or None (with the error recorded) if no
+        slot freed up in time.
+        """
+        bulkhead = self._bulkheads["llm" if endpoint.startswith(_LLM_PREFIXES) else "meta"]
+        if bulkhead.acquire(timeout=_read_timeout(endpoint, self.timeout)):
+            return bulkhead
+        
+        self._record_error(ApiError("busy", "Too many requests in progress. Please wait for them to finish and try again."))
+        logger.warning(f"Bulkhead full, rejected {method} {endpoint}")
+        return None
+    
+    def _record_request_error(self, method: str, endpoint: str, exc: Exception):
+        """Record a failed request for render_errors with a message for its kind of failure"""
+        if isinstance(exc, BackendUnavailableError):
+            self._record_error(ApiError("unavailable", "Backend service is unavailable. Retrying automatically in a few seconds."))
+            logger.warning(f"Circuit open, skipped {method} {endpoint}")
+        elif isinstance(exc, httpx.TimeoutException):
+            self._record_error(ApiError("timeout", "Request timed out. Please try again."))
+            logger.error(f"Timeout for {method} {endpoint}")
+        elif isinstance(exc, httpx.ConnectError):
+            self._record_error(ApiError("connect", "Cannot connect to the backend service. Please ensure the API server is running."))
             logger.error(f"Connection error for {method} {endpoint}")
-            return None
-        except httpx.HTTPStatusError as e:
-            st.error(f"API request failed: {e.response.status_code}")
-            logger.error(f"HTTP error {e.response.status_code} for {method} {endpoint}")
-            return None
+        elif isinstance(exc, httpx.HTTPStatusError):
+            self._record_error(ApiError("http", f"API request failed: {exc.response.status_code}", exc.response.status_code))
+            logger.error(f"HTTP error {exc.response.status_code} for {method} {endpoint}")
+        else:
+            self._record_error(ApiError("other", f"Unexpected error: {str(exc)}"))
+            logger.error(f"Unexpected error for {method} {endpoint}: {str(exc)}")
+    
+    def _record_error(self, error: ApiError):
+        """Queue an error on the current session; the client itself is shared by all sessions"""
+        try:
+            st.session_state.setdefault("api_errors", []).append(error)
+        except Exception:
+            pass  # no Streamlit session, e.g. a script using the client directly; already logged
+    
+    def take_errors(self) -> List[ApiError]:
+        """Return and clear the API errors recorded for the current session"""
+        return st.session_state.pop("api_errors", [])
+    
+    def render_errors(self, container=None):
+        """Show this run's API errors, each distinct message once"""
+        container = container or st
+        for message in dict.fromkeys(error.message for error in self.take_errors()):
+            container.error(message)
+    
+    def _post_model(self, endpoint: str, model: BaseModel,
+                    params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """POST a pydantic model, serialized straight to JSON bytes"""
+        return self._make_request(
+            "POST",
+            endpoint,
+            content=model.model_dump_json(),
+            headers={"Content-Type": "application/json"},
+            params=params
+        )
+    
+    def _request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        """Send a request and raise for error statuses; a 304 reply is returned as is"""
+        self._check_circuit()
+        try:
+            response = self._client.request(method, endpoint, **kwargs)
+            # httpx treats 304 as an error, but it answers our conditional GETs
+            if response.status_code != 304:
+                response.raise_for_status()
         except Exception as e:
-            st.error(f"Unexpected error: {str(e)}")
-            logger.error(f"Unexpected error for {method} {endpoint}: {str(e)}")
-            return None
+            self._record_failure(e)
+            raise
+        
+        self._close_circuit()
+        return response
+    
+    def _check_circuit(self):
+        """Fail fast while the backend is known to be down, letting one probe through per cooldown"""
+        with self._breaker_lock:
+            if not self._breaker_open_until:
+                return
+            now = time.monotonic()
+            if now < self._breaker_open_until:
+                raise BackendUnavailableError("Backend temporarily unavailable")
+            # Half-open: this request probes the backend; others keep failing fast
+            self._breaker_open_until = now + _BREAKER_COOLDOWN
+    
+    def _close_circuit(self):
+        """The backend answered: clear the failure count and close the circuit"""
+        with self._breaker_lock:
+            self._consecutive_failures = 0
+            self._breaker_open_until = 0.0
+    
+    def _record_failure(self, exc: Exception):
+        """Count a failure that suggests the backend is down, opening the circuit after too many in a row.
+        
+        Only transport errors and 5xx replies count. Any other HTTP reply, such as
+        a 404 or 422, shows the backend is up, so it closes the circuit even when
+        it answers a half-open probe.
+        """
+        if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code < 500:
+            self._close_circuit()
+            return
+        if not isinstance(exc, (httpx.HTTPStatusError, httpx.TransportError)):
+            return
+        
+        with self._breaker_lock:
+            if self._breaker_open_until:
+                return  # a failed probe; the circuit stays open for the new cooldown
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= _BREAKER_THRESHOLD:
+                self._breaker_open_until = time.monotonic() + _BREAKER_COOLDOWN
+                self._consecutive_failures = 0
+                logger.warning(f"Backend circuit breaker open for {_BREAKER_COOLDOWN}s after repeated failures")
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=_retry_wait,
+        retry=retry_if_exception(_is_transient),
+        reraise=True
+    )
+    def _request_with_retries(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        """Send an idempotent request, retrying transient failures"""
+        return self._request(method, endpoint, **kwargs)
     
     # Health and Status
     def health_check(self) -> bool:
@@ -63,8 +425,15 @@ class APIClient:
         result = self._make_request("GET", f"/api/users/{user_id}/profile")
         
         if result and result.get("success") and result.get("data"):
+            data = result["data"]
+            parsed = self._parsed_profiles.get(user_id)
+            if parsed is not None and parsed[0] is data:
+                return parsed[1]
+            
             try:
-                return UserProfile(**result["data"])
+                profile = UserProfile(**data)
+                self._parsed_profiles[user_id] = (data, profile)
+                return profile
             except Exception as e:
                 logger.error(f"Error parsing user profile: {str(e)}")
                 return None
@@ -72,11 +441,7 @@ class APIClient:
     
     def update_user_profile(self, user_id: str, profile: UserProfile) -> bool:
         """Update user profile"""
-        result = self._make_request(
-            "POST", 
-            f"/api/users/{user_id}/profile",
-            json=profile.model_dump()
-        )
+        result = self._post_model(f"/api/users/{user_id}/profile", profile)
         
         return result is not None and result.get("success", False)
       # Problem Generation
@@ -87,12 +452,7 @@ class APIClient:
         try:
             if request:
                 # Use the proper generate endpoint with request object
-                result = self._make_request(
-                    "POST",
-                    "/api/problems/generate",
-                    json=request.model_dump(),
-                    params={"user_id": user_id}
-                )
+                result = self._post_model("/api/problems/generate", request, params={"user_id": user_id})
                 
                 if result and result.get("success") and result.get("data"):
                     return result["data"].get("problems", [])
@@ -152,23 +512,22 @@ class APIClient:
     # Hint System
     def get_next_hint(self, user_id: str, request: HintRequest) -> Optional[Dict[str, Any]]:
         """Get next level hint"""
-        result = self._make_request(
-            "POST",            "/api/hints/next",
-            json=request.model_dump(),
-            params={"user_id": user_id}
-        )
+        result = self._post_model("/api/hints/next", request, params={"user_id": user_id})
         
         if result and result.get("success") and result.get("data"):
             return result["data"]
         return None
     
-    def get_progressive_hint(self, user_code: str = "", user_id: str = "anonymous") -> Optional[Dict[str, Any]]:
-        """Get a progressive hint for the current problem"""
+    def get_progressive_hint(self, problem: Dict[str, Any], user_code: str = "",
+                             user_id: str = "anonymous",
+                             problem_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a progressive hint for the problem on screen, sent along with the request"""
         try:
             hint_request = HintRequest(
+                problem_id=problem_id or problem.get('id'),
                 user_approach=user_code,
                 current_hint_level=1,
-                specific_question=""
+                problem=_hint_problem(problem)
             )
             
             return self.get_next_hint(user_id, hint_request)
@@ -176,11 +535,12 @@ class APIClient:
             logger.error(f"Error getting progressive hint: {str(e)}")
             return None
     
-    def get_personalized_hint(self, user_id: str, user_approach: str) -> Optional[Dict[str, Any]]:
+    def get_personalized_hint(self, user_id: str, user_approach: str,
+                              problem: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Get personalized hint based on user approach"""
-        result = self._make_request(
-            "POST",
+        result = self._post_model(
             "/api/hints/personalized",
+            _hint_problem(problem),
             params={"user_id": user_id, "user_approach": user_approach}
         )
         
@@ -189,21 +549,17 @@ class APIClient:
         return None
       # Code Review
     def review_code(self, code: str, language: str, focus_areas: List[str] = None, 
-                   user_id: str = "anonymous") -> Optional[Dict[str, Any]]:
+                   user_id: str = "anonymous", problem_context: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Review submitted code with flexible parameters"""
         try:
             request = CodeReviewRequest(
                 code=code,
                 language=language,
+                problem_context=problem_context or None,
                 focus_aspects=focus_areas or ["correctness", "efficiency", "style"]
             )
             
-            result = self._make_request(
-                "POST",
-                "/api/code-review",
-                json=request.model_dump(),
-                params={"user_id": user_id}
-            )
+            result = self._post_model("/api/code-review", request, params={"user_id": user_id})
             
             if result and result.get("success") and result.get("data"):
                 return result["data"]
@@ -212,6 +568,60 @@ class APIClient:
             logger.error(f"Error in review_code: {str(e)}")
             return None
     
+    def review_code_stream(self, code: str, language: str, focus_areas: List[str] = None,
+                           user_id: str = "anonymous",
+                           problem_context: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+        """Stream a code review from the SSE endpoint as (event, data) pairs.
+        
+        Yields ("chunk", text) and ("section", name) while the model writes, then
+        ("review", review data). On failure the error is recorded and iteration stops.
+        """
+        endpoint = "/api/code-review/stream"
+        request = CodeReviewRequest(
+            code=code,
+            language=language,
+            problem_context=problem_context or None,
+            focus_aspects=focus_areas or ["correctness", "efficiency", "style"]
+        )
+        
+        bulkhead = self._acquire_bulkhead("POST", endpoint)
+        if bulkhead is None:
+            return
+        
+        try:
+            self._check_circuit()
+            with self._client.stream(
+                "POST",
+                endpoint,
+                content=request.model_dump_json(),
+                headers={"Content-Type": "application/json"},
+                params={"user_id": user_id},
+                timeout=_timeout_for(endpoint, self.timeout)
+            ) as response:
+                response.raise_for_status()
+                self._close_circuit()
+                
+                event = "message"
+                for line in response.iter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: "):
+                        data = orjson.loads(line[6:])
+                        if event == "chunk":
+                            yield "chunk", data["text"]
+                        elif event == "section":
+                            yield "section", data["section"]
+                        elif event == "review":
+                            yield "review", data
+                
+                # The backend saves the review to the user's history as the stream ends
+                self.invalidate("/api/users/")
+        except Exception as e:
+            self._record_failure(e)
+            self._record_request_error("POST", endpoint, e)
+        finally:
+            bulkhead.release()
+    
     def get_code_review_history(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get user's code review history"""
         result = self._make_request(
@@ -391,3 +801,4 @@ class APIClient:
 
 # Global API client instance
 api_client = APIClient()
+atexit.register(api_client.close)
@@ -1,18 +1,77 @@
 import streamlit as st
 import os
+import time
+import importlib
+from frontend.env import init_env
+
+# Load .env before shared.config reads API_HOST/API_PORT
+init_env()
+
 from frontend.api_client import api_client
-from frontend.components.problem_generator import ProblemGeneratorComponent
-from frontend.components.hint_system import HintSystemComponent
-from frontend.components.code_reviewer import CodeReviewerComponent
-from frontend.components.progress_tracker import ProgressTrackerComponent
-from frontend.components.interview_simulator import InterviewSimulatorComponent
-from frontend.components.code_debugger import CodeDebuggerComponent
 from shared.config import DEFAULT_USER_ID, setup_logging
 from shared.models import UserProfile, SkillLevel, TargetGoal
 
 # Setup logging
 logger = setup_logging()
 
+# Profile form options and their positions, built once rather than on every rerun
+_SKILL_VALUES = tuple(level.value for level in SkillLevel)
+_SKILL_INDEX = {value: i for i, value in enumerate(_SKILL_VALUES)}
+_GOAL_VALUES = tuple(goal.value for goal in TargetGoal)
+_GOAL_INDEX = {value: i for i, value in enumerate(_GOAL_VALUES)}
+
+# Seconds a successful health check is trusted before the next rerun checks again.
+# Failures are not remembered, so a disconnected session re-checks every rerun.
+_HEALTH_RECHECK_INTERVAL = 30.0
+
+# Custom CSS, built once at import. It is still emitted on every rerun because
+# Streamlit drops any element a rerun does not render again.
+_CUSTOM_CSS = """
+<style>
+.main {
+    padding-top: 1rem;
+}
+.stSelectbox > div > div {
+    background-color: #000000;
+}
+.metric-card {
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    padding: 1rem;
+    border-radius: 10px;
+    color: white;
+    margin: 0.5rem 0;
+}
+.feature-card {
+    background: #ffffff;
+    padding: 1.5rem;
+    border-radius: 10px;
+    border: 1px solid #e0e0e0;
+    margin: 1rem 0;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+}
+.stButton > button {
+    border-radius: 20px;
+    border: none;
+    padding: 0.5rem 1rem;
+    font-weight: 600;
+}
+.stButton > button:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 4px 8px rgba(0,0,0,0.2);
+}
+</style>
+"""
+
+@st.cache_resource
+def _get_component(module: str, class_name: str):
+    """Import a page component on first use and share one instance across reruns.
+    
+    Components keep all user state in st.session_state, so sharing is safe, and
+    startup only loads the page being shown (pandas only for the tracker).
+    """
+    component_cls = getattr(importlib.import_module(f"frontend.components.{module}"), class_name)
+    return component_cls(api_client)
+
 # Initialize session state
 def initialize_session_state():
     """Initialize session state variables"""
@@ -28,10 +87,15 @@ def initialize_session_state():
         st.session_state.api_connected = False
 
 def check_api_connection():
-    """Check if API is connected and working"""
+    """Check if API is connected and working, at most once per interval while it is"""
+    last_ok = st.session_state.get('api_last_ok')
+    if last_ok is not None and time.monotonic() - last_ok < _HEALTH_RECHECK_INTERVAL:
+        return True
+    
     try:
         if api_client.health_check():
             st.session_state.api_connected = True
+            st.session_state.api_last_ok = time.monotonic()
             return True
         else:
             st.session_state.api_connected = False
@@ -47,13 +111,27 @@ def render_api_status():
         st.error("⚠️ Backend API is not connected. Please ensure the API server is running on port 8000.")
         st.info("To start the backend server, run: `uvicorn backend.main:app --reload`")
         
-        if st.button("🔄 Retry Connection"):
-            if check_api_connection():
-                st.success("✅ Connected to backend API!")
-                st.rerun()
+        # Clicking reruns the script, and main() checks the connection again
+        # first thing, so the button needs no round-trip of its own
+        st.button("🔄 Retry Connection")
         return False
     return True
 
+def resolve_pending_profile_save():
+    """Roll back an optimistically applied profile once its save has failed"""
+    pending = st.session_state.get('pending_profile_save')
+    if pending is None or not pending[0].done():
+        return
+    
+    future, user_id, previous = pending
+    st.session_state.pending_profile_save = None
+    if future.exception() is None and future.result():
+        return
+    
+    if st.session_state.get('user_profile_id') == user_id:
+        st.session_state.user_profile = previous
+    st.warning("⚠️ Your profile could not be saved, so the previous settings were restored.")
+
 def render_sidebar():
     """Render sidebar with navigation and settings"""
     with st.sidebar:
@@ -73,7 +151,8 @@ def render_sidebar():
             "Choose a feature:",
             options=list(feature_options.keys()),
             format_func=lambda x: x,
-            help="Select a feature to get started"
+            help="Select a feature to get started",
+            key="current_page"
         )
         
         # Show feature description
@@ -84,12 +163,27 @@ def render_sidebar():
         # API Status
         st.markdown("### ⚙️ System Status")
         
+        # The profile only changes when this session saves it, so keep it in
+        # session state for the current user instead of refetching every rerun
+        if st.session_state.get('user_profile_id') != st.session_state.user_id:
+            st.session_state.user_profile = None
+            st.session_state.user_profile_id = st.session_state.user_id
+        resolve_pending_profile_save()
+        existing_profile = st.session_state.user_profile
+        
         if st.session_state.api_connected:
             st.success("✅ API Connected")
             
-            # Get API status
+            # Get API status, and the user profile alongside it if not loaded yet
             try:
-                status = api_client.get_api_status()
+                if existing_profile is None:
+                    status, existing_profile = api_client.fetch_all(
+                        api_client.get_api_status,
+                        lambda: api_client.get_user_profile(st.session_state.user_id)
+                    )
+                    st.session_state.user_profile = existing_profile
+                else:
+                    status = api_client.get_api_status()
                 if status and status.get("data"):
                     data = status["data"]
                     gemini_status = "✅ Connected" if data.get("gemini_connected") else "❌ Not configured"
@@ -102,18 +196,15 @@ def render_sidebar():
         st.divider()
         
         # User Profile
-        render_user_profile_sidebar()
+        render_user_profile_sidebar(existing_profile)
         
         return page
 
-def render_user_profile_sidebar():
+def render_user_profile_sidebar(existing_profile: UserProfile = None):
     """Render user profile section in sidebar"""
     st.markdown("### 👤 User Profile")
     
     try:
-        # Load existing profile
-        existing_profile = api_client.get_user_profile(st.session_state.user_id)
-        
         if existing_profile:
             st.success(f"**Level:** {existing_profile.skill_level.value}")
             st.info(f"**Goal:** {existing_profile.target_goal.value}")
@@ -124,14 +215,14 @@ def render_user_profile_sidebar():
             with st.form("profile_form"):
                 skill_level = st.selectbox(
                     "Skill Level",
-                    options=[level.value for level in SkillLevel],
-                    index=1 if not existing_profile else [level.value for level in SkillLevel].index(existing_profile.skill_level.value)
+                    options=_SKILL_VALUES,
+                    index=1 if not existing_profile else _SKILL_INDEX[existing_profile.skill_level.value]
                 )
                 
                 target_goal = st.selectbox(
                     "Target Goal",
-                    options=[goal.value for goal in TargetGoal],
-                    index=0 if not existing_profile else [goal.value for goal in TargetGoal].index(existing_profile.target_goal.value)
+                    options=_GOAL_VALUES,
+                    index=0 if not existing_profile else _GOAL_INDEX[existing_profile.target_goal.value]
                 )
                 
                 daily_goal = st.slider(
@@ -148,16 +239,25 @@ def render_user_profile_sidebar():
                         daily_goal=daily_goal
                     )
                     
-                    if api_client.update_user_profile(st.session_state.user_id, profile):
-                        st.success("Profile updated successfully!")
-                        st.rerun()
-                    else:
-                        st.error("Failed to update profile")
+                    # Show the new profile straight away and save it in the
+                    # background; a failed save is rolled back on a later rerun
+                    st.session_state.pending_profile_save = (
+                        api_client.submit(api_client.update_user_profile, st.session_state.user_id, profile),
+                        st.session_state.user_id,
+                        existing_profile
+                    )
+                    st.session_state.user_profile = profile
+                    st.toast("✅ Profile saved")
+                    st.rerun()
     
     except Exception as e:
         logger.error(f"Error in user profile sidebar: {str(e)}")
         st.error("Could not load user profile")
 
+def navigate_to(page: str):
+    """Button callback that switches the sidebar page before the next run renders it"""
+    st.session_state.current_page = page
+
 def render_welcome_section():
     """Render welcome section for new users"""
     if st.session_state.api_connected:
@@ -169,19 +269,16 @@ def render_welcome_section():
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("🎯 Generate Practice Problems", use_container_width=True):
-            st.session_state.quick_nav = "🎯 Problem Generator"
-            st.rerun()
+        st.button("🎯 Generate Practice Problems", use_container_width=True,
+                  on_click=navigate_to, args=("🎯 Problem Generator",))
     
     with col2:
-        if st.button("💡 Get Smart Hints", use_container_width=True):
-            st.session_state.quick_nav = "💡 Hint System"
-            st.rerun()
+        st.button("💡 Get Smart Hints", use_container_width=True,
+                  on_click=navigate_to, args=("💡 Hint System",))
     
     with col3:
-        if st.button("📝 Review My Code", use_container_width=True):
-            st.session_state.quick_nav = "📝 Code Review"
-            st.rerun()
+        st.button("📝 Review My Code", use_container_width=True,
+                  on_click=navigate_to, args=("📝 Code Review",))
 
 def main():
     """Main application function"""
@@ -193,41 +290,7 @@ def main():
     )
     
     # Custom CSS
-    st.markdown("""
-    <style>
-    .main {
-        padding-top: 1rem;
-    }
-    .stSelectbox > div > div {
-        background-color: #000000;
-    }
-    .metric-card {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 1rem;
-        border-radius: 10px;
-        color: white;
-        margin: 0.5rem 0;
-    }
-    .feature-card {
-        background: #ffffff;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border: 1px solid #e0e0e0;
-        margin: 1rem 0;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .stButton > button {
-        border-radius: 20px;
-        border: none;
-        padding: 0.5rem 1rem;
-        font-weight: 600;
-    }
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(_CUSTOM_CSS, unsafe_allow_html=True)
     
     # Initialize session state
     initialize_session_state()
@@ -247,42 +310,36 @@ def main():
     #     else:
     #         st.error("🔴 System Offline")
     
+    # API errors are collected while the page renders and shown here once
+    error_banner = st.container()
+    
     # Render API status check
     if not render_api_status():
+        api_client.render_errors(error_banner)
         return
     
     # Render sidebar and get selected page
     page = render_sidebar()
     
-    # Handle quick navigation
-    if st.session_state.get('quick_nav'):
-        page = st.session_state.quick_nav
-        st.session_state.quick_nav = None
-      # Main content area
+    # Main content area
     try:
         if page == "🎯 Problem Generator":
-            problem_generator = ProblemGeneratorComponent(api_client)
-            problem_generator.render()
+            _get_component("problem_generator", "ProblemGeneratorComponent").render()
         
         elif page == "💡 Hint System":
-            hint_system = HintSystemComponent(api_client)
-            hint_system.render()
+            _get_component("hint_system", "HintSystemComponent").render()
         
         elif page == "📝 Code Review":
-            code_reviewer = CodeReviewerComponent(api_client)
-            code_reviewer.render()
+            _get_component("code_reviewer", "CodeReviewerComponent").render()
         
         elif page == "📊 Progress Tracker":
-            progress_tracker = ProgressTrackerComponent(api_client)
-            progress_tracker.render()
+            _get_component("progress_tracker", "ProgressTrackerComponent").render()
         
         elif page == "🎤 Interview Simulator":
-            interview_simulator = InterviewSimulatorComponent(api_client)
-            interview_simulator.render()
+            _get_component("interview_simulator", "InterviewSimulatorComponent").render()
         
         elif page == "🐛 Code Debugger":
-            code_debugger = CodeDebuggerComponent(api_client)
-            code_debugger.render()
+            _get_component("code_debugger", "CodeDebuggerComponent").render()
         
         else:
             st.info(f"🚧 {page.split(' ', 1)[1]} is coming soon! Please try other features.")
@@ -292,6 +349,8 @@ def main():
         logger.error(f"Error rendering page {page}: {str(e)}")
         st.error("An error occurred while loading this feature. Please try again.")
     
+    api_client.render_errors(error_banner)
+    
     # Footer
     st.markdown("---")
     col1, col2, col3 = st.columns(3)
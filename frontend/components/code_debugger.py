@@ -1,13 +1,149 @@
 import streamlit as st
+import io
 import re
-from typing import Dict, Any, List
+import tokenize
+from hashlib import blake2b
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+# Line-based bug checks as (pattern, offset of the reported line, bug). Each pattern
+# matches a whole offending line in multiline mode, so one C-level scan replaces a
+# Python loop over lines.
+_PYTHON_BUG_RULES = (
+    (re.compile(r'^(?![^\n]*(?:\+1|-1))(?=[^\n]*range\()(?=[^\n]*\))(?=[^\n]*len\()[^\n]*$', re.M), 0, {
+        'type': 'Potential Off-by-One Error',
+        'description': 'Using len() in range might cause index out of bounds',
+        'severity': 'Medium',
+        'suggestion': 'Consider using range(len(array)) carefully or range(len(array)-1) if needed'
+    }),
+    (re.compile(r'^(?=[^\n]*def )(?=[^\n]*\[\])[^\n]*$', re.M), 0, {
+        'type': 'Mutable Default Argument',
+        'description': 'Using mutable object as default argument can cause unexpected behavior',
+        'severity': 'High',
+        'suggestion': 'Use None as default and create the list inside the function'
+    }),
+    # A return followed by a line that is not a comment, block start or branch. Only
+    # used when the code does not tokenize; see _find_unreachable_code.
+    (re.compile(r'^[ \t]*return[^\n]*(?=\n[ \t]*(?!#|(?:def|class|if) [^\n]*\S|else|elif)\S)', re.M), 1, {
+        'type': 'Unreachable Code',
+        'description': 'Code after return statement will never execute',
+        'severity': 'Medium',
+        'suggestion': 'Remove unreachable code or restructure the logic'
+    }),
+)
+
+# Rules for brace languages. The assignment check looks for a lone "=" inside the
+# parenthesised condition of an if/while, not elsewhere on the line, so
+# "if (x == 1) y = 2;" and comparisons such as ===, <= or => do not match.
+# Python is left out: assigning in a condition is a syntax error there.
+_GENERIC_BUG_RULES = (
+    (re.compile(r'^[^\n]*?\b(?:if|while)\s*\((?:[^()\n]|\([^()\n]*\))*?(?<![=!<>+\-*/%&|^:])=(?![=>])[^\n]*$', re.M), 0, {
+        'type': 'Assignment in Condition',
+        'description': 'Using assignment (=) instead of comparison (==) in condition',
+        'severity': 'High',
+        'suggestion': 'Use == for comparison or != for not equal'
+    }),
+)
+
+_UNREACHABLE_RULE = _PYTHON_BUG_RULES[2]
+
+# Full rule list per lowercased language; anything else gets the generic rules
+_BUG_RULES_BY_LANGUAGE = MappingProxyType({
+    'python': _PYTHON_BUG_RULES,
+})
+
+def _find_unreachable_code(code: str) -> Optional[List[Tuple[int, int]]]:
+    """Find statements following a return in the same block, in one tokenizer pass.
+    
+    Returns (return line, unreachable statement line) pairs, or None when the code
+    does not tokenize. Multi-line returns and blank or comment lines are handled;
+    a return in a one-line suite ("if x: return y") ends nothing that follows it.
+    """
+    found = []
+    statement_start = True
+    return_line = None  # a return statement still being read
+    after_return = None  # a completed return, waiting for the next statement
+    
+    # Tokens are consumed as they are produced rather than collected into a list
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type in (tokenize.NL, tokenize.COMMENT, tokenize.INDENT):
+                continue
+            if token.type == tokenize.NEWLINE:
+                statement_start = True
+                if return_line is not None:
+                    after_return, return_line = return_line, None
+                continue
+            if token.type in (tokenize.DEDENT, tokenize.ENDMARKER):
+                after_return = None  # the block ended right after the return
+                continue
+            
+            if after_return is not None:
+                found.append((after_return, token.start[0]))
+                after_return = None
+            if statement_start and token.type == tokenize.NAME and token.string == 'return':
+                return_line = token.start[0]
+            statement_start = False
+    except (tokenize.TokenError, SyntaxError):
+        return None
+    
+    return found
+
+# Example buggy code per language for the debugger's "Load example" action
+_EXAMPLE_CODE = MappingProxyType({
+    'Python': '''def find_max(numbers):
+    max_num = 0  # Bug: assumes all numbers are positive
+    for i in range(len(numbers) + 1):  # Bug: off-by-one error
+        if numbers[i] > max_num:
+            max_num = numbers[i]
+    return max_num
+
+# Test case that might fail
+result = find_max([-5, -2, -10])  # Should return -2, not 0
+print(result)''',
+    
+    'Java': '''public class Calculator {
+    public int divide(int a, int b) {
+        return a / b;  // Bug: no check for division by zero
+    }
+    
+    public boolean isEven(int n) {
+        if (n % 2 = 0) {  // Bug: assignment instead of comparison
+            return true;
+        }
+        return false;
+    }
+}''',
+    
+    'JavaScript': '''function processArray(arr) {
+    for (var i = 0; i < arr.length; i++) {
+        setTimeout(function() {
+            console.log(arr[i]);  // Bug: closure issue with var
+        }, 100);
+    }
+}
+
+// Bug: will print undefined multiple times
+processArray([1, 2, 3, 4, 5]);'''
+})
+
+_DEFAULT_EXAMPLE_CODE = '''// Paste your problematic code here
+// The debugger will help you find and fix issues'''
+
+# Analyze and Optimize share one review covering both sets of focus areas
+_DEBUG_REVIEW_FOCUS = ["correctness", "efficiency", "performance", "style", "bugs"]
 
 class CodeDebuggerComponent:
     def __init__(self, api_client):
         self.api_client = api_client
     
+    @st.fragment
     def render(self):
-        """Render the code debugger interface"""
+        """Render the code debugger interface.
+        
+        Runs as a fragment, so its buttons rerun only the debugger and not the
+        sidebar and status checks; its own st.rerun calls are scoped the same way.
+        """
         st.header("🐛 Code Debugger")
         st.markdown("Debug and fix problematic code with AI assistance")
         
@@ -25,6 +161,9 @@ class CodeDebuggerComponent:
         
         if st.session_state.debug_results:
             self._display_debug_results()
+        
+        # The page's error banner is only drawn on full reruns
+        self.api_client.render_errors()
     
     def _display_code_input(self):
         """Display code input section"""
@@ -48,56 +187,58 @@ class CodeDebuggerComponent:
             if st.button("📝 Load Example"):
                 example_code = self._get_example_code(selected_language)
                 st.session_state.debug_code = example_code
-                st.rerun()
+                st.rerun(scope="fragment")
         
-        # Code editor
-        try:
-            from streamlit_ace import st_ace
+        # The editor and context fields sit in a form so typing does not rerun
+        # the whole app; everything is sent together when the user applies it
+        with st.form("debug_editor_form", clear_on_submit=False):
+            # Code editor
+            try:
+                from streamlit_ace import st_ace
+                
+                user_code = st_ace(
+                    value=st.session_state.debug_code,
+                    language=selected_language.lower(),
+                    theme='monokai',
+                    key='debug_code_editor',
+                    height=400,
+                    auto_update=False,
+                    wrap=True,
+                    annotations=None
+                )
+            except ImportError:
+                # Fallback to text area
+                user_code = st.text_area(
+                    "Paste your problematic code here:",
+                    value=st.session_state.debug_code,
+                    height=400,
+                    key="debug_code_textarea",
+                    placeholder="Paste the code that's not working as expected..."
+                )
             
-            user_code = st_ace(
-                value=st.session_state.debug_code,
-                language=selected_language.lower(),
-                theme='monokai',
-                key='debug_code_editor',
-                height=400,
-                auto_update=False,
-                wrap=True,
-                annotations=None
-            )
+            # Additional context
+            st.markdown("### 📋 Additional Context")
+            
+            col_error, col_expected = st.columns(2)
+            
+            with col_error:
+                st.text_area(
+                    "Error Message (if any):",
+                    height=100,
+                    placeholder="Paste any error messages or stack traces here...",
+                    key="debug_error_message"
+                )
+            
+            with col_expected:
+                st.text_area(
+                    "Expected Behavior:",
+                    height=100,
+                    placeholder="Describe what the code should do...",
+                    key="debug_expected_behavior"
+                )
             
-            if user_code != st.session_state.debug_code:
+            if st.form_submit_button("✅ Apply Code"):
                 st.session_state.debug_code = user_code
-        except ImportError:
-            # Fallback to text area
-            user_code = st.text_area(
-                "Paste your problematic code here:",
-                value=st.session_state.debug_code,
-                height=400,
-                key="debug_code_textarea",
-                placeholder="Paste the code that's not working as expected..."
-            )
-            st.session_state.debug_code = user_code
-        
-        # Additional context
-        st.markdown("### 📋 Additional Context")
-        
-        col_error, col_expected = st.columns(2)
-        
-        with col_error:
-            error_message = st.text_area(
-                "Error Message (if any):",
-                height=100,
-                placeholder="Paste any error messages or stack traces here...",
-                key="debug_error_message"
-            )
-        
-        with col_expected:
-            expected_behavior = st.text_area(
-                "Expected Behavior:",
-                height=100,
-                placeholder="Describe what the code should do...",
-                key="debug_expected_behavior"
-            )
     
     def _display_debug_controls(self):
         """Display debugging control buttons"""
@@ -129,25 +270,65 @@ class CodeDebuggerComponent:
         
         with st.spinner("🔍 Analyzing your code..."):
             try:
-                # Use code review API for analysis
-                review = self.api_client.review_code(
-                    code=st.session_state.debug_code,
-                    language=st.session_state.debug_language,
-                    focus_areas=["correctness", "efficiency", "style", "bugs"],
-                    user_id=st.session_state.get('user_id', 'anonymous')
-                )
+                review = self._review_debug_code()
                 
                 if review:
                     st.session_state.debug_results = {
                         'type': 'analysis',
                         'data': review
                     }
-                    st.rerun()
+                    st.rerun(scope="fragment")
                 else:
                     st.error("Failed to analyze code. Please try again.")
             except Exception as e:
                 st.error(f"Error analyzing code: {str(e)}")
     
+    def _cached_result(self, kind: str, compute: Callable[[], Any]) -> Any:
+        """Return compute()'s result for the current code, reusing it until the code changes.
+        
+        Results are keyed by a blake2b fingerprint of the language and code; a new
+        fingerprint drops everything cached for the previous one. Empty results
+        are not cached so a failed request can be retried.
+        """
+        key = blake2b(
+            f"{st.session_state.debug_language}\0{st.session_state.debug_code}".encode(),
+            digest_size=16
+        ).digest()
+        cached = st.session_state.get('debug_cache')
+        if cached is None or cached[0] != key:
+            cached = st.session_state.debug_cache = (key, {})
+        
+        results = cached[1]
+        if kind not in results:
+            result = compute()
+            if not result:
+                return result
+            results[kind] = result
+        return results[kind]
+    
+    def _review_debug_code(self) -> Optional[Dict[str, Any]]:
+        """Review the current code once for both Analyze and Optimize"""
+        return self._cached_result('review', self._stream_review)
+    
+    def _stream_review(self) -> Optional[Dict[str, Any]]:
+        """Review the current code, showing the text while the model is still writing it"""
+        placeholder = st.empty()
+        chunks = []
+        review = None
+        for event, data in self.api_client.review_code_stream(
+            code=st.session_state.debug_code,
+            language=st.session_state.debug_language,
+            focus_areas=_DEBUG_REVIEW_FOCUS,
+            user_id=st.session_state.get('user_id', 'anonymous')
+        ):
+            if event == "chunk":
+                chunks.append(data)
+                placeholder.markdown("".join(chunks))
+            elif event == "review":
+                review = data
+        placeholder.empty()
+        return review
+    
     def _find_bugs(self):
         """Find potential bugs in the code"""
         if not st.session_state.debug_code.strip():
@@ -161,7 +342,9 @@ class CodeDebuggerComponent:
                 expected_context = st.session_state.get('debug_expected_behavior', '')
                 
                 # Use a simplified approach for now
-                bugs = self._detect_common_bugs(st.session_state.debug_code, st.session_state.debug_language)
+                bugs = self._cached_result('bugs', lambda: self._detect_common_bugs(
+                    st.session_state.debug_code, st.session_state.debug_language
+                ))
                 
                 st.session_state.debug_results = {
                     'type': 'bugs',
@@ -171,7 +354,7 @@ class CodeDebuggerComponent:
                         'expected_context': expected_context
                     }
                 }
-                st.rerun()
+                st.rerun(scope="fragment")
             except Exception as e:
                 st.error(f"Error finding bugs: {str(e)}")
     
@@ -183,20 +366,14 @@ class CodeDebuggerComponent:
         
         with st.spinner("⚡ Finding optimization opportunities..."):
             try:
-                # Use code review API focusing on efficiency
-                review = self.api_client.review_code(
-                    code=st.session_state.debug_code,
-                    language=st.session_state.debug_language,
-                    focus_areas=["efficiency", "performance"],
-                    user_id=st.session_state.get('user_id', 'anonymous')
-                )
+                review = self._review_debug_code()
                 
                 if review:
                     st.session_state.debug_results = {
                         'type': 'optimization',
                         'data': review
                     }
-                    st.rerun()
+                    st.rerun(scope="fragment")
                 else:
                     st.error("Failed to optimize code. Please try again.")
             except Exception as e:
@@ -211,13 +388,15 @@ class CodeDebuggerComponent:
         with st.spinner("🧪 Generating test suggestions..."):
             try:
                 # Generate test case suggestions
-                tests = self._generate_test_suggestions(st.session_state.debug_code, st.session_state.debug_language)
+                tests = self._cached_result('tests', lambda: self._generate_test_suggestions(
+                    st.session_state.debug_code, st.session_state.debug_language
+                ))
                 
                 st.session_state.debug_results = {
                     'type': 'tests',
                     'data': {'test_suggestions': tests}
                 }
-                st.rerun()
+                st.rerun(scope="fragment")
             except Exception as e:
                 st.error(f"Error generating tests: {str(e)}")
     
@@ -321,57 +500,29 @@ class CodeDebuggerComponent:
     
     def _detect_common_bugs(self, code: str, language: str) -> List[Dict]:
         """Detect common programming bugs"""
-        bugs = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            line_stripped = line.strip()
-            
-            # Common Python bugs
-            if language.lower() == 'python':
-                # Off-by-one errors
-                if 'range(' in line and ')' in line:
-                    if 'len(' in line and '+1' not in line and '-1' not in line:
-                        bugs.append({
-                            'type': 'Potential Off-by-One Error',
-                            'description': 'Using len() in range might cause index out of bounds',
-                            'line': i,
-                            'severity': 'Medium',
-                            'suggestion': 'Consider using range(len(array)) carefully or range(len(array)-1) if needed'
-                        })
-                
-                # Mutable default arguments
-                if 'def ' in line and '[]' in line:
-                    bugs.append({
-                        'type': 'Mutable Default Argument',
-                        'description': 'Using mutable object as default argument can cause unexpected behavior',
-                        'line': i,
-                        'severity': 'High',
-                        'suggestion': 'Use None as default and create the list inside the function'
-                    })
-                
-                # Unreachable code after return
-                if line_stripped.startswith('return') and i < len(lines):
-                    next_line = lines[i].strip() if i < len(lines) else ''
-                    if next_line and not next_line.startswith(('#', 'def ', 'class ', 'if ', 'else', 'elif')):
-                        bugs.append({
-                            'type': 'Unreachable Code',
-                            'description': 'Code after return statement will never execute',
-                            'line': i + 1,
-                            'severity': 'Medium',
-                            'suggestion': 'Remove unreachable code or restructure the logic'
-                        })
+        lang = language.lower()
+        rules = _BUG_RULES_BY_LANGUAGE.get(lang, _GENERIC_BUG_RULES)
+        unreachable = _find_unreachable_code(code) if lang == 'python' else None
+        
+        # (line the rule matched on, rule order, bug), sorted to report line by line
+        found = []
+        for order, rule in enumerate(rules):
+            pattern, line_offset, template = rule
+            if rule is _UNREACHABLE_RULE and unreachable is not None:
+                found.extend(
+                    (return_line, order, self._make_bug(template, line))
+                    for return_line, line in unreachable
+                )
+                continue
             
-            # Common logic errors for all languages
-            if '=' in line and '==' not in line and '!=' not in line:
-                if any(keyword in line for keyword in ['if ', 'while ', 'elif ']):
-                    bugs.append({
-                        'type': 'Assignment in Condition',
-                        'description': 'Using assignment (=) instead of comparison (==) in condition',
-                        'line': i,
-                        'severity': 'High',
-                        'suggestion': 'Use == for comparison or != for not equal'
-                    })
+            line, pos = 1, 0
+            for match in pattern.finditer(code):
+                line += code.count('\n', pos, match.start())
+                pos = match.start()
+                found.append((line, order, self._make_bug(template, line + line_offset)))
+        
+        found.sort(key=lambda item: item[:2])
+        bugs = [bug for _, _, bug in found]
         
         # If no specific bugs found, add general suggestions
         if not bugs:
@@ -385,6 +536,16 @@ class CodeDebuggerComponent:
         
         return bugs
     
+    def _make_bug(self, template: Dict[str, str], line: int) -> Dict:
+        """Build a bug report for a rule match on the given line"""
+        return {
+            'type': template['type'],
+            'description': template['description'],
+            'line': line,
+            'severity': template['severity'],
+            'suggestion': template['suggestion']
+        }
+    
     def _generate_test_suggestions(self, code: str, language: str) -> List[Dict]:
         """Generate test case suggestions"""
         tests = []
@@ -420,42 +581,4 @@ class CodeDebuggerComponent:
     
     def _get_example_code(self, language: str) -> str:
         """Get example buggy code for demonstration"""
-        examples = {
-            'Python': '''def find_max(numbers):
-    max_num = 0  # Bug: assumes all numbers are positive
-    for i in range(len(numbers) + 1):  # Bug: off-by-one error
-        if numbers[i] > max_num:
-            max_num = numbers[i]
-    return max_num
-
-# Test case that might fail
-result = find_max([-5, -2, -10])  # Should return -2, not 0
-print(result)''',
-            
-            'Java': '''public class Calculator {
-    public int divide(int a, int b) {
-        return a / b;  // Bug: no check for division by zero
-    }
-    
-    public boolean isEven(int n) {
-        if (n % 2 = 0) {  // Bug: assignment instead of comparison
-            return true;
-        }
-        return false;
-    }
-}''',
-            
-            'JavaScript': '''function processArray(arr) {
-    for (var i = 0; i < arr.length; i++) {
-        setTimeout(function() {
-            console.log(arr[i]);  // Bug: closure issue with var
-        }, 100);
-    }
-}
-
-// Bug: will print undefined multiple times
-processArray([1, 2, 3, 4, 5]);'''
-        }
-        
-        return examples.get(language, '''// Paste your problematic code here
-// The debugger will help you find and fix issues''')
+        return _EXAMPLE_CODE.get(language, _DEFAULT_EXAMPLE_CODE)
@@ -1,5 +1,24 @@
 import streamlit as st
-from typing import Dict, Any, Optional
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Dict, Any, Optional, Tuple
+
+# Keywords counted towards the rough complexity estimate, as whole words
+_COMPLEXITY_RE = re.compile(r'\b(?:for|while|if|def|class|function)\b', re.IGNORECASE)
+
+# Reviews kept per session for repeated identical requests, least recently used dropped
+_REVIEW_CACHE_MAX_ENTRIES = 16
+
+@lru_cache(maxsize=32)
+def _code_stats(code: str) -> Tuple[int, int, int, int]:
+    """Return (lines, characters, words, complexity score) for the code.
+    
+    Cached on the code itself, so reruns with unchanged code cost a lookup.
+    """
+    complexity = sum(1 for _ in _COMPLEXITY_RE.finditer(code))
+    return code.count('\n') + 1, len(code), len(code.split()), complexity
 
 class CodeReviewerComponent:
     def __init__(self, api_client):
@@ -52,42 +71,42 @@ class CodeReviewerComponent:
         # Store in session state for use in other methods
         st.session_state.selected_language = selected_language
         
-        # Code editor
-        try:
-            from streamlit_ace import st_ace
-            
-            user_code = st_ace(
-                value=st.session_state.review_code,
-                language=selected_language.lower(),
-                theme='github',
-                key='review_code_editor',
-                height=400,
-                auto_update=False,
-                wrap=True,
-                font_size=14,
-                show_gutter=True,
-                show_print_margin=True,
-                annotations=None
-            )
+        # The editor sits in a form so typing does not rerun the app; the code,
+        # and the statistics below, update when the user applies it
+        with st.form("review_input_form", clear_on_submit=False):
+            # Code editor
+            try:
+                from streamlit_ace import st_ace
+                
+                user_code = st_ace(
+                    value=st.session_state.review_code,
+                    language=selected_language.lower(),
+                    theme='github',
+                    key='review_code_editor',
+                    height=400,
+                    auto_update=False,
+                    wrap=True,
+                    font_size=14,
+                    show_gutter=True,
+                    show_print_margin=True,
+                    annotations=None
+                )
+            except ImportError:
+                # Fallback to text area if ace editor not available
+                user_code = st.text_area(
+                    "Paste your code here:",
+                    value=st.session_state.review_code,
+                    height=400,
+                    key="review_code_textarea",
+                    placeholder="Paste your solution here for detailed review..."
+                )
             
-            if user_code != st.session_state.review_code:
+            if st.form_submit_button("✅ Apply Code"):
                 st.session_state.review_code = user_code
-        except ImportError:
-            # Fallback to text area if ace editor not available
-            user_code = st.text_area(
-                "Paste your code here:",
-                value=st.session_state.review_code,
-                height=400,
-                key="review_code_textarea",
-                placeholder="Paste your solution here for detailed review..."
-            )
-            st.session_state.review_code = user_code
         
         # Code statistics
         if st.session_state.review_code:
-            lines = len(st.session_state.review_code.split('\n'))
-            chars = len(st.session_state.review_code)
-            words = len(st.session_state.review_code.split())
+            lines, chars, words, complexity_count = _code_stats(st.session_state.review_code)
             
             col1, col2, col3, col4 = st.columns(4)
             with col1:
@@ -97,9 +116,6 @@ class CodeReviewerComponent:
             with col3:
                 st.metric("Words", words)
             with col4:
-                # Estimate complexity based on keywords
-                complexity_keywords = ['for', 'while', 'if', 'def', 'class', 'function']
-                complexity_count = sum(st.session_state.review_code.lower().count(keyword) for keyword in complexity_keywords)
                 st.metric("Complexity Score", complexity_count)
     
     def _display_review_configuration(self):
@@ -141,6 +157,12 @@ class CodeReviewerComponent:
                 value=True,
                 help="Get specific suggestions for improving your code"
             )
+            
+            force_refresh = st.checkbox(
+                "Force Fresh Review",
+                value=False,
+                help="Ask for a new review even if this exact code was reviewed already"
+            )
         
         # Problem context (optional)
         with st.expander("🎯 Problem Context (Optional)"):
@@ -177,23 +199,39 @@ class CodeReviewerComponent:
                     focus_areas,
                     review_depth,
                     include_suggestions,
-                    problem_context
+                    problem_context,
+                    force_refresh
                 )
     
     def _perform_code_review(self, code: str, language: str, focus_areas: list, 
-                           review_depth: str, include_suggestions: bool, problem_context: str):
-        """Perform the code review using the API"""
+                           review_depth: str, include_suggestions: bool, problem_context: str,
+                           force_refresh: bool = False):
+        """Perform the code review using the API, showing its text as the model writes it.
+        
+        An identical earlier request in this session is answered from its stored
+        review unless force_refresh is set.
+        """
+        # Key on exactly what is sent to the backend
+        cache_key = blake2b(
+            repr((code, language, sorted(focus_areas), problem_context)).encode(),
+            digest_size=16
+        ).digest()
+        review_cache = st.session_state.setdefault('review_cache', OrderedDict())
+        if not force_refresh and cache_key in review_cache:
+            review_cache.move_to_end(cache_key)
+            st.session_state.review_results = review_cache[cache_key]
+            st.rerun()
+        
         with st.spinner("🔎 Analyzing your code... This may take a moment"):
             try:
-                response = self.api_client.review_code(
-                    code=code,
-                    language=language,
-                    focus_areas=focus_areas,
-                    user_id=st.session_state.get('user_id', 'anonymous')
-                )
+                response = self._stream_review(code, language, focus_areas, problem_context)
                 
                 if response:
                     st.session_state.review_results = response
+                    review_cache[cache_key] = response
+                    review_cache.move_to_end(cache_key)
+                    while len(review_cache) > _REVIEW_CACHE_MAX_ENTRIES:
+                        review_cache.popitem(last=False)
                     
                     # Add to history
                     review_entry = {
@@ -213,6 +251,27 @@ class CodeReviewerComponent:
             except Exception as e:
                 st.error(f"❌ Error during code review: {str(e)}")
     
+    def _stream_review(self, code: str, language: str, focus_areas: list,
+                       problem_context: str) -> Optional[Dict[str, Any]]:
+        """Stream one review covering every focus area and return its final result"""
+        placeholder = st.empty()
+        chunks = []
+        response = None
+        for event, data in self.api_client.review_code_stream(
+            code=code,
+            language=language,
+            focus_areas=focus_areas,
+            user_id=st.session_state.get('user_id', 'anonymous'),
+            problem_context=problem_context
+        ):
+            if event == "chunk":
+                chunks.append(data)
+                placeholder.markdown("".join(chunks))
+            elif event == "review":
+                response = data
+        placeholder.empty()
+        return response
+    
     def _display_review_results(self):
         """Display the code review results"""
         results = st.session_state.review_results
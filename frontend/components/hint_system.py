@@ -252,7 +252,8 @@ class HintSystemComponent:
             try:
                 response = self.api_client.get_progressive_hint(
                     user_code=st.session_state.user_code,
-                    user_id=st.session_state.get('user_id', 'anonymous')
+                    user_id=st.session_state.get('user_id', 'anonymous'),
+                    problem=st.session_state.current_problem
                 )
                 
                 if response:
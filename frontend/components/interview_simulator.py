@@ -262,7 +262,8 @@ class InterviewSimulatorComponent:
         try:
             hint = self.api_client.get_progressive_hint(
                 user_code=current_code,
-                user_id=st.session_state.get('user_id', 'anonymous')
+                user_id=st.session_state.get('user_id', 'anonymous'),
+                problem=question
             )
             
             if hint:
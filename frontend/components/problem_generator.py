@@ -217,7 +217,8 @@ class ProblemGeneratorComponent:
                 response = self.api_client.get_progressive_hint(
                     problem_id=st.session_state.current_problem.get('id'),
                     user_code=st.session_state.user_solution,
-                    user_id=st.session_state.get('user_id', 'anonymous')
+                    user_id=st.session_state.get('user_id', 'anonymous'),
+                    problem=st.session_state.current_problem
                 )
                 
                 if response:
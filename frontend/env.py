@@ -0,0 +1,9 @@
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+
+@lru_cache(maxsize=1)
+def init_env():
+    """Load .env into the environment once per process"""
+    load_dotenv()
+    os.environ.setdefault("GOOGLE_API_KEY", "")
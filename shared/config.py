@@ -9,12 +9,33 @@ API_URL = f"http://{API_HOST}:{API_PORT}"
 
 # Gemini API Configuration
 GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY", "")
+# Optional comma-separated list of keys to spread requests across projects
+GEMINI_API_KEYS = [key.strip() for key in os.getenv("GEMINI_API_KEYS", "").split(",") if key.strip()] or (
+    [GEMINI_API_KEY] if GEMINI_API_KEY else []
+)
+GEMINI_KEY_RPM = int(os.getenv("GEMINI_KEY_RPM", "15"))
 GEMINI_MODEL_NAME = "gemini-1.5-flash"
+GEMINI_API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+GEMINI_REQUEST_TIMEOUT = 120.0
+GEMINI_MAX_CONNECTIONS = 100
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = 20
+GEMINI_PREWARM_CONNECTIONS = 2
+GEMINI_CONNECTION_CHECK_TTL = 30.0  # seconds a passing connection test is trusted
+
+# Response Caching
+RESPONSE_CACHE_TTL = 86400  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = 512
+HINT_CACHE_TTL = 3600  # seconds
+HINT_CACHE_MAX_ENTRIES = 4096
 
 # Data Configuration
 DATA_DIR = "data"
+# Legacy single-file stores, migrated into USERS_DIR and HISTORY_DIR on startup
 USER_PROGRESS_FILE = "user_progress.json"
 PROBLEMS_HISTORY_FILE = "problems_history.json"
+USERS_DIR = "users"  # one profile/favorites file per user, inside DATA_DIR
+HISTORY_DIR = "history"  # per-user append-only JSONL logs, inside DATA_DIR
+PROFILE_CACHE_TTL = 3600  # seconds
 
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -23,14 +44,21 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 # Rate Limiting
 MAX_RETRIES = 3
 RETRY_DELAY = 1
+RETRY_MAX_DELAY = 8
+CIRCUIT_BREAKER_THRESHOLD = 5  # consecutive transient failures before failing fast
+CIRCUIT_BREAKER_COOLDOWN = 60  # seconds to fail fast once tripped
 
 # UI Configuration
 DEFAULT_USER_ID = "default_user"
 MAX_HINT_LEVELS = 4
 MAX_PROBLEMS_PER_GENERATION = 10
+PROBLEM_GENERATION_CONCURRENCY = 5  # variations generated in parallel per request
+PROBLEM_VARIATION_TIMEOUT = 30.0  # seconds allowed per variation
+HINT_REQUEST_TIMEOUT = 20.0  # seconds allowed per hint, including retries
 
 # File Upload Limits
-MAX_CODE_LENGTH = 10000
+MAX_CODE_LENGTH = 10000  # longer submissions are truncated before prompting
+MAX_CODE_REVIEW_LENGTH = 32 * 1024  # longer submissions are rejected outright
 SUPPORTED_LANGUAGES = ["python", "java", "cpp", "javascript", "go", "rust", "c"]
 
 def setup_logging():
@@ -67,9 +67,11 @@ class ProblemGenerationResponse(BaseModel):
 
 # Hint System Models
 class HintRequest(BaseModel):
-    problem_id: str
+    problem_id: Optional[str] = None
     current_hint_level: int = 0
     user_approach: Optional[str] = None
+    # The problem being solved, sent in full since problems are not stored by id
+    problem: Problem
 
 class Hint(BaseModel):
     level: int